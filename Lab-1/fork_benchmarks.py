@@ -0,0 +1,49 @@
+import os
+import time
+
+from parallel_reduce import WorkerPool, fork_reduce
+
+"""
+Speedup of fork_reduce and WorkerPool over reducing in the parent alone, for growing numbers of children. The
+reduction is a sum of squares computed element by element, so it is CPU bound and can only speed up with more than
+one CPU. Each measurement is a few reductions of the same range; with WorkerPool the workers are forked once before
+them, so the difference between the two columns is the cost of forking. Run this file directly to print the results.
+"""
+
+
+def _square(i):
+    return i * i
+
+
+def time_reductions(reduce, n, repeats):
+    """Seconds for `repeats` calls of reduce(0, n), checking every result"""
+    expected = (n - 1) * n * (2 * n - 1) // 6
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        total = reduce(0, n)
+        if total != expected:
+            raise AssertionError(f"got {total}, expected {expected}")
+    return time.perf_counter() - start_time
+
+
+def benchmark_speedup(children_counts=(0, 1, 2, 4, 8), n=2000000, repeats=5):
+    """(children, fork_reduce speedup, WorkerPool speedup) rows, relative to the parent reducing alone"""
+    baseline = time_reductions(lambda start, stop: fork_reduce(start, stop, _square, 0), n, repeats)
+    results = []
+    for children in children_counts:
+        fork_seconds = time_reductions(lambda start, stop: fork_reduce(start, stop, _square, children), n, repeats)
+        with WorkerPool(children) as pool:
+            pool_seconds = time_reductions(lambda start, stop: pool.reduce(start, stop, _square), n, repeats)
+        results.append((children, baseline / fork_seconds, baseline / pool_seconds))
+    return results
+
+
+def main():
+    print(f"Speedup of a sum of squares over 0 to 2,000,000, 5 times ({os.cpu_count()} CPUs)")
+    print(f"{'children':>10} {'fork_reduce':>12} {'WorkerPool':>12}")
+    for children, fork_speedup, pool_speedup in benchmark_speedup():
+        print(f"{children:>10} {fork_speedup:>12.2f} {pool_speedup:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
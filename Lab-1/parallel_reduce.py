@@ -0,0 +1,251 @@
+import argparse
+import functools
+import operator
+import os
+import pickle
+import selectors
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+Reduce a function over a range of integers in several processes. The range is split into one contiguous chunk per
+process, each process reduces its chunk, and the chunk results are combined in order in the parent.
+
+Results come back from the children pickled over a pipe, not through the exit status (which only keeps 8 bits), so
+they are exact however large they get.
+
+- fork_reduce forks a child for every chunk but the first, which the parent reduces itself while the children run.
+  The function can be anything, even a lambda, because the children inherit it from the parent.
+- WorkerPool forks its workers once and sends them chunks over pipes, so repeated reductions do not pay for forking.
+  The function is pickled to the workers, so it has to be defined at module level.
+- pool_reduce uses a ProcessPoolExecutor. The function has to be picklable as well.
+"""
+
+
+def sum_range(start, stop):
+    """Returns start + (start + 1) + ... + (stop - 1) in constant time, or 0 for an empty range"""
+    if stop <= start:
+        return 0
+    return (start + stop - 1) * (stop - start) // 2
+
+
+def chunks(start, stop, parts):
+    """Splits range(start, stop) into at most `parts` contiguous (chunk_start, chunk_stop) pairs of nearly equal size"""
+    length = max(0, stop - start)
+    parts = max(1, min(parts, length))
+    size, extra = divmod(length, parts)
+    bounds = []
+    chunk_start = start
+    for part in range(parts):
+        chunk_stop = chunk_start + size + (1 if part < extra else 0)
+        if chunk_stop > chunk_start:
+            bounds.append((chunk_start, chunk_stop))
+        chunk_start = chunk_stop
+    return bounds
+
+
+def reduce_range(start, stop, function=None, combine=operator.add, initial=0):
+    """
+    Combines function(i) for every i in range(start, stop), starting from `initial`. Without a function the integers
+    themselves are combined; their sum is computed in closed form.
+    """
+    if function is None:
+        if combine is operator.add:
+            return initial + sum_range(start, stop)
+        return functools.reduce(combine, range(start, stop), initial)
+    return functools.reduce(combine, map(function, range(start, stop)), initial)
+
+
+def _reduce_chunk(chunk_start, chunk_stop, function, combine):
+    """Reduces a non-empty chunk, starting from its first element instead of an initial value"""
+    return reduce_range(chunk_start + 1, chunk_stop, function, combine,
+                        function(chunk_start) if function else chunk_start)
+
+
+def send_result(fd, value):
+    """Pickles `value` to the pipe `fd` and closes it"""
+    with os.fdopen(fd, "wb") as pipe:
+        pickle.dump(value, pipe)
+
+
+def receive_result(fd):
+    """Reads a value sent with send_result from the pipe `fd` and closes it"""
+    with os.fdopen(fd, "rb") as pipe:
+        return pickle.load(pipe)
+
+
+def _try_reduce_chunk(chunk_start, chunk_stop, function, combine):
+    """(True, result) of _reduce_chunk, or (False, exception) if it raised one"""
+    try:
+        return True, _reduce_chunk(chunk_start, chunk_stop, function, combine)
+    except Exception as error:
+        return False, error
+
+
+def _combine_results(results, combine, initial):
+    """Raises the first exception among the (ok, value) results, or combines their values in order"""
+    for ok, value in results:
+        if not ok:
+            raise value
+    return functools.reduce(combine, (value for _, value in results), initial)
+
+
+def fork_reduce(start, stop, function=None, processes=None, combine=operator.add, initial=0):
+    """
+    reduce_range split between the parent and `processes` forked children (default: the number of CPUs). The parent
+    reduces the first chunk while the children reduce the others, then collects each child's result as soon as that
+    child finishes. `combine` must be associative, since every process combines its own chunk. An exception in a
+    child is raised again in the parent.
+    """
+    processes = os.cpu_count() if processes is None else processes
+    bounds = chunks(start, stop, processes + 1)
+    if not bounds:
+        return initial
+    # {read end of the child's pipe: (pid, chunk number)}
+    children = {}
+    for index, (chunk_start, chunk_stop) in enumerate(bounds[1:], 1):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # Child process
+            os.close(read_fd)
+            for other_fd in children:
+                os.close(other_fd)
+            try:
+                send_result(write_fd, _try_reduce_chunk(chunk_start, chunk_stop, function, combine))
+            finally:
+                os._exit(0)  # Never return into the parent's code
+        os.close(write_fd)
+        children[read_fd] = (pid, index)
+
+    results = [None] * len(bounds)
+    results[0] = _try_reduce_chunk(*bounds[0], function, combine)
+
+    # Read the pipes as data arrives, so no child blocks on a full pipe. A child's pipe reaches end of file when the
+    # child exits, and then the child is reaped.
+    received = {read_fd: bytearray() for read_fd in children}
+    with selectors.DefaultSelector() as selector:
+        for read_fd in children:
+            selector.register(read_fd, selectors.EVENT_READ)
+        while children:
+            for key, _ in selector.select():
+                read_fd = key.fd
+                data = os.read(read_fd, 65536)
+                if data:
+                    received[read_fd] += data
+                    continue
+                selector.unregister(read_fd)
+                os.close(read_fd)
+                pid, index = children.pop(read_fd)
+                os.waitpid(pid, 0)
+                try:
+                    results[index] = pickle.loads(received.pop(read_fd))
+                except (EOFError, pickle.UnpicklingError):
+                    results[index] = (False, ChildProcessError(f"child {pid} exited without a result"))
+    return _combine_results(results, combine, initial)
+
+
+def _worker(task_fd, result_fd):
+    """Loop of a WorkerPool worker: reduce every chunk read from `task_fd` until it is closed"""
+    with os.fdopen(task_fd, "rb") as tasks, os.fdopen(result_fd, "wb") as results:
+        while True:
+            try:
+                chunk_start, chunk_stop, function, combine = pickle.load(tasks)
+            except EOFError:
+                return
+            pickle.dump(_try_reduce_chunk(chunk_start, chunk_stop, function, combine), results)
+            results.flush()
+
+
+class WorkerPool:
+    """
+    `processes` pre-forked workers (default: the number of CPUs) for repeated fork_reduce-style reductions. Each
+    worker has a pipe for chunks and a pipe for results. Close the pool, or use it in a with statement, to stop them.
+    """
+
+    def __init__(self, processes=None):
+        processes = os.cpu_count() if processes is None else processes
+        # (pid, chunk pipe, result pipe) of every worker
+        self.workers = []
+        for _ in range(processes):
+            task_read, task_write = os.pipe()
+            result_read, result_write = os.pipe()
+            pid = os.fork()
+            if pid == 0:  # Worker process
+                os.close(task_write)
+                os.close(result_read)
+                # Let go of the other workers' pipes, or they would never see their chunk pipe close
+                for _, tasks, results in self.workers:
+                    os.close(tasks.fileno())
+                    os.close(results.fileno())
+                try:
+                    _worker(task_read, result_write)
+                finally:
+                    os._exit(0)
+            os.close(task_read)
+            os.close(result_write)
+            self.workers.append((pid, os.fdopen(task_write, "wb"), os.fdopen(result_read, "rb")))
+
+    def reduce(self, start, stop, function=None, combine=operator.add, initial=0):
+        """fork_reduce on the pool's workers; `function` and `combine` must be picklable"""
+        bounds = chunks(start, stop, len(self.workers) + 1)
+        if not bounds:
+            return initial
+        workers = self.workers[:len(bounds) - 1]
+        for (_, tasks, _), (chunk_start, chunk_stop) in zip(workers, bounds[1:]):
+            pickle.dump((chunk_start, chunk_stop, function, combine), tasks)
+            tasks.flush()
+        results = [_try_reduce_chunk(*bounds[0], function, combine)]
+        results += [pickle.load(worker_results) for _, _, worker_results in workers]
+        return _combine_results(results, combine, initial)
+
+    def close(self):
+        for pid, tasks, results in self.workers:
+            tasks.close()  # The worker reads end of file and exits
+            results.close()
+            os.waitpid(pid, 0)
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def pool_reduce(start, stop, function=None, processes=None, combine=operator.add, initial=0):
+    """fork_reduce with a ProcessPoolExecutor; `function` and `combine` must be picklable"""
+    bounds = chunks(start, stop, os.cpu_count() if processes is None else processes)
+    if not bounds:
+        return initial
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(_try_reduce_chunk, *zip(*bounds), [function] * len(bounds), [combine] * len(bounds))
+        return _combine_results(list(results), combine, initial)
+
+
+def _square(i):
+    return i * i
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sum 0 + 1 + ... + n, or the squares, in several processes.")
+    parser.add_argument("n", type=int, help="last number of the sum")
+    parser.add_argument("--processes", type=int, help="number of processes (default: the number of CPUs)")
+    parser.add_argument("--mode", choices=("fork", "workers", "pool"), default="fork",
+                        help="fork children, use a pre-forked WorkerPool, or use a ProcessPoolExecutor")
+    parser.add_argument("--squares", action="store_true", help="sum the squares of the numbers instead")
+    args = parser.parse_args()
+
+    function = _square if args.squares else None
+    if args.mode == "workers":
+        with WorkerPool(args.processes) as pool:
+            total = pool.reduce(0, args.n + 1, function)
+    else:
+        reducer = fork_reduce if args.mode == "fork" else pool_reduce
+        total = reducer(0, args.n + 1, function, args.processes)
+    expected = args.n * (args.n + 1) * (2 * args.n + 1) // 6 if args.squares else sum_range(0, args.n + 1)
+    print(f"The total is: {total}")
+    if total != expected:
+        raise SystemExit(f"Expected {expected}")
+
+
+if __name__ == "__main__":
+    main()
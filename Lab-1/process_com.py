@@ -1,24 +1,17 @@
-import os
 import sys
-import math
+
+from parallel_reduce import fork_reduce, sum_range
 
 def A(y):
-    """Computes and returns the sum of 0 + 1 + 2 + 3 + ... + k + ... + [y/2]"""
-    total = 0
-    for i in range(int(y/2) + 1):
-        total += i
-    return total
+    """Computes and returns the sum of 0 + 1 + 2 + 3 + ... + k + ... + [y/2], in closed form"""
+    # Integer division keeps y/2 exact for any y; a negative y gives an empty sum
+    return sum_range(0, y // 2 + 1) if y >= 0 else 0
 
 def B(y):
-    """Computes the sum of [(y/2)+1] + [((y+1)/2)+1] + [((y+2)/2)+1] + ... [((y+k)/2)+1] + ... + y"""
-    total = 0
-    for i in range(int(math.floor(y/2)+1), y+1):
-        total += i
-    return total
-
-def main(n = None):
-    Total = 0
+    """Computes the sum of [(y/2)+1] + [((y+1)/2)+1] + [((y+2)/2)+1] + ... [((y+k)/2)+1] + ... + y, in closed form"""
+    return sum_range(y // 2 + 1, y + 1)
 
+def main(n = None, processes = None):
     # Check for the correct number of command-line arguments
     if n is None:
         print("The program needs one parameter to be executed (e.g., python_script.py 13)")
@@ -31,27 +24,16 @@ def main(n = None):
         print("Unvalid parameter: The parameter should be greater than 0, exiting ...")
         sys.exit(0)
 
-    # Create a child process
-    pid = os.fork()
-    print("pid=", pid)
-
-    # If the fork failed
-    if pid < 0:
-        print("Fork system call failed")
+    # The total is A(x) + B(x) = 0 + 1 + ... + x. Split the range between this process and `processes` forked
+    # children (default: one per CPU): this process sums the first share, starting at 0 like A, while the children
+    # sum the rest, and their totals come back over pipes as each child finishes.
+    try:
+        Total = fork_reduce(0, x + 1, processes=processes)
+    except OSError as error:
+        print(f"Fork system call failed: {error}")
         return
 
-    if pid != 0:  # Parent process
-        child_pid, exit_status = os.wait()
-        child_total = exit_status >> 8
-        Total += A(x)
-        Total = child_total + Total
-    else:  # Child process
-        Total += B(x)
-        os._exit(Total)  # Ensure the child process terminates here
-
-    # If this is the parent process, print the total summation
-    if pid != 0:
-        print(f"The total is: {Total}")
+    print(f"The total is: {Total}")
 
 if __name__ == "__main__":
     n = 1
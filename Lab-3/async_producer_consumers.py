@@ -0,0 +1,182 @@
+import asyncio
+import time
+from collections import deque
+from itertools import islice
+
+'''
+The producer-consumer problem of producer_consumers on one asyncio event loop. Producers and consumers are
+coroutines instead of threads, so tens of thousands of them cost a few kilobytes each and waiting on the buffer
+or on simulated I/O (asyncio.sleep) does not need a context switch.
+
+AsyncSharedBuffer has the same bounded buffer semantics as SharedBuffer: producers wait while it is full
+(backpressure), consumers wait while it is empty, and it closes with the same close and drain protocol. Adding and
+reading are coroutines and must be awaited; producer_done and close are plain methods. Waiting coroutines are kept
+in first in, first out queues of futures, so waking one is O(1) however many are waiting.
+'''
+
+
+class AsyncSharedBuffer:
+    def __init__(self, size, producers=4, consumers=10):
+        # Internal shared buffer
+        self.buffer = deque()
+        self.size = size
+        # Futures of the coroutines waiting for the buffer to be not empty and not full, first come first served.
+        # The event loop runs one coroutine at a time, so no lock is needed between checking and changing the buffer.
+        self.notEmpty = deque()
+        self.notFull = deque()
+        # Flag to signal that production is done and no more messages will be added
+        self.closed = False
+        # keep track of the number of producers that are still producing
+        self.producers = producers
+        # keep track of the number of consumers
+        self.consumers = consumers
+
+    # Wait until another coroutine wakes this one up through `waiters`
+    async def _wait(self, waiters, ready):
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            waiter.cancel()
+            # If this coroutine was woken up just before it was cancelled, pass the wakeup on
+            if ready():
+                _wake(waiters)
+            raise
+
+    def _has_space(self):
+        return len(self.buffer) < self.size or self.closed
+
+    def _has_messages(self):
+        return bool(self.buffer) or self.closed
+
+    '''
+    Add a message to the buffer. If the buffer is full, the producer will wait. Adding to a closed buffer raises
+    RuntimeError.
+    '''
+
+    async def add_message(self, message):
+        while not self._has_space():
+            await self._wait(self.notFull, self._has_space)
+        if self.closed:
+            raise RuntimeError("add_message on a closed AsyncSharedBuffer")
+        self.buffer.append(message)
+        _wake(self.notEmpty)
+
+    '''
+    Read a message from the buffer. If the buffer is empty, the consumer will wait. Returns None once the buffer is
+    closed and empty.
+    '''
+
+    async def read_message(self):
+        while not self._has_messages():
+            await self._wait(self.notEmpty, self._has_messages)
+        if not self.buffer:
+            return None
+        message = self.buffer.popleft()
+        _wake(self.notFull)
+        return message
+
+    '''
+    Add all the messages of a batch, in order. If the buffer is full, the producer will wait.
+    '''
+
+    async def add_messages(self, batch):
+        if not isinstance(batch, (list, tuple)):
+            batch = list(batch)
+        position = 0
+        while position < len(batch):
+            while not self._has_space():
+                await self._wait(self.notFull, self._has_space)
+            if self.closed:
+                raise RuntimeError("add_messages on a closed AsyncSharedBuffer")
+            space = min(self.size - len(self.buffer), len(batch) - position)
+            self.buffer.extend(islice(batch, position, position + space))
+            _wake(self.notEmpty, space)
+            position += space
+
+    '''
+    Read up to max_n messages from the buffer in one go. Returns an empty list once the buffer is closed and empty.
+    '''
+
+    async def read_messages(self, max_n):
+        while not self._has_messages():
+            await self._wait(self.notEmpty, self._has_messages)
+        count = min(max_n, len(self.buffer))
+        messages = [self.buffer.popleft() for _ in range(count)]
+        _wake(self.notFull, count)
+        return messages
+
+    # Called by each producer when it has added all its messages. The buffer is closed when the last one is done.
+    def producer_done(self):
+        self.producers -= 1
+        if self.producers == 0:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            _wake(self.notEmpty, len(self.notEmpty))
+            _wake(self.notFull, len(self.notFull))
+
+
+# Wake up the first `n` coroutines still waiting in `waiters`
+def _wake(waiters, n=1):
+    while waiters and n:
+        waiter = waiters.popleft()
+        if not waiter.done():
+            waiter.set_result(None)
+            n -= 1
+
+
+'''
+Producer and consumer coroutines, the asyncio counterparts of producer_consumers.producer and consumer. With
+`verbose` off they do not print every message, which would dominate runs with many coroutines.
+'''
+
+
+async def producer(buffer, task_id, write_time=2, num_messages=5, verbose=True):
+    for message_number in range(num_messages):
+        message = f"Message {message_number} from Producer {task_id}"
+        await buffer.add_message(message)
+        if verbose:
+            print(f"Producer {task_id} produced: {message}")
+        await asyncio.sleep(write_time)  # Simulate writing time without blocking the other coroutines
+    buffer.producer_done()
+
+
+# Returns the number of messages consumed
+async def consumer(buffer, task_id, read_time=1, verbose=True):
+    consumed = 0
+    while True:
+        message = await buffer.read_message()
+        if message is None:
+            # production is done and the buffer is drained
+            return consumed
+        consumed += 1
+        if verbose:
+            print(f"Consumer {task_id} consumed: {message}")
+        await asyncio.sleep(read_time)  # Simulate reading time
+
+
+# Run `producer_num` producers and `consumer_num` consumers to completion. Returns the number of messages consumed.
+async def run(producer_num=5, consumer_num=10, buffer_size=1, read_time=2, write_time=3, num_messages=5,
+              verbose=True):
+    buffer = AsyncSharedBuffer(buffer_size, producer_num, consumer_num)
+    producers = [producer(buffer, i, write_time, num_messages, verbose) for i in range(producer_num)]
+    consumers = [consumer(buffer, i, read_time, verbose) for i in range(consumer_num)]
+    results = await asyncio.gather(*producers, *consumers)
+    return sum(results[producer_num:])
+
+
+def main(producer_num=5, consumer_num=10, buffer_size=1, read_time=2, write_time=3):
+    start_time = time.time()  # Record start time
+    asyncio.run(run(producer_num, consumer_num, buffer_size, read_time, write_time))
+    end_time = time.time()  # Record end time
+
+    print("All producers and consumers have finished.")
+    print(f"Total execution time: {format(end_time - start_time, '.2f')} seconds")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import threading
+import time
+
+import async_producer_consumers
+import producer_consumers
+from producer_consumers import SharedBuffer
+from shared_memory_buffer import SharedMemoryBuffer
+
+'''
+Benchmarks for SharedBuffer. Producers and consumers do no work besides moving messages, so the numbers measure
+the buffer itself. Run this file directly to print the results.
+'''
+
+
+'''
+Messages per second through a SharedBuffer with `producer_num` producers each adding `messages_per_producer`
+messages and `consumer_num` consumers reading them. With a `batch_size`, messages are moved with add_messages and
+read_messages in batches of that size, otherwise one at a time. Also checks that every message is read exactly once.
+'''
+
+
+def benchmark_throughput(producer_num=4, consumer_num=4, buffer_size=1024, messages_per_producer=50000,
+                         batch_size=None):
+    buffer = SharedBuffer(buffer_size, producer_num, consumer_num)
+    received = [[] for _ in range(consumer_num)]
+
+    def produce(thread_id):
+        messages = range(thread_id * messages_per_producer, (thread_id + 1) * messages_per_producer)
+        if batch_size is None:
+            for message in messages:
+                buffer.add_message(message)
+        else:
+            for start in range(0, messages_per_producer, batch_size):
+                buffer.add_messages(messages[start:start + batch_size])
+        buffer.producer_done()
+
+    def consume(thread_id):
+        messages = received[thread_id]
+        if batch_size is None:
+            while (message := buffer.read_message()) is not None:
+                messages.append(message)
+        else:
+            while batch := buffer.read_messages(batch_size):
+                messages.extend(batch)
+
+    producers = [threading.Thread(target=produce, args=(i,)) for i in range(producer_num)]
+    consumers = [threading.Thread(target=consume, args=(i,)) for i in range(consumer_num)]
+
+    start_time = time.perf_counter()
+    for thread in producers + consumers:
+        thread.start()
+    for thread in producers + consumers:
+        thread.join()
+    end_time = time.perf_counter()
+
+    num_messages = producer_num * messages_per_producer
+    messages = sorted(message for messages in received for message in messages)
+    if messages != list(range(num_messages)):
+        raise AssertionError(f"{len(messages)} messages were read, expected each of the {num_messages} exactly once")
+    return num_messages / (end_time - start_time)
+
+
+# Stand-in for a CPU-bound consumer: a pure Python checksum that holds the GIL for `work` steps
+def process_message(message, work):
+    checksum = 0
+    for i in range(work):
+        checksum = (checksum * 31 + message[i % len(message)]) & 0xFFFFFFFF
+    return checksum
+
+
+def _produce(buffer, num_messages, message_size):
+    message = bytes(range(256)) * (message_size // 256) + bytes(message_size % 256)
+    for _ in range(num_messages):
+        buffer.add_message(message)
+    buffer.producer_done()
+
+
+# `report` receives the number of messages the consumer processed
+def _consume(buffer, work, report):
+    count = 0
+    while (message := buffer.read_message()) is not None:
+        process_message(message, work)
+        count += 1
+    report(count)
+
+
+'''
+Messages per second with one producer and `num_workers` CPU-bound consumers, as threads sharing a SharedBuffer and
+as processes sharing a SharedMemoryBuffer. Threads take turns holding the GIL, so only processes can use more than
+one core. Also checks that every message was processed.
+'''
+
+
+def benchmark_workers(worker_counts=(1, 4, 16), num_messages=20000, message_size=64, work=200, buffer_size=1024):
+    results = []
+    for num_workers in worker_counts:
+        buffer = SharedBuffer(buffer_size, 1, num_workers)
+        processed = []
+        threads = [threading.Thread(target=_produce, args=(buffer, num_messages, message_size))]
+        threads += [threading.Thread(target=_consume, args=(buffer, work, processed.append)) for _ in range(num_workers)]
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        thread_seconds = time.perf_counter() - start_time
+        if sum(processed) != num_messages:
+            raise AssertionError(f"Threads processed {sum(processed)} of {num_messages} messages")
+
+        buffer = SharedMemoryBuffer(buffer_size, 1, num_workers, slot_size=message_size)
+        processed = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_produce, args=(buffer, num_messages, message_size))]
+        processes += [multiprocessing.Process(target=_consume, args=(buffer, work, processed.put))
+                      for _ in range(num_workers)]
+        try:
+            start_time = time.perf_counter()
+            for process in processes:
+                process.start()
+            counts = [processed.get() for _ in range(num_workers)]
+            for process in processes:
+                process.join()
+            process_seconds = time.perf_counter() - start_time
+        finally:
+            buffer.unlink()
+        if sum(counts) != num_messages:
+            raise AssertionError(f"Processes processed {sum(counts)} of {num_messages} messages")
+
+        results.append((num_workers, num_messages / thread_seconds, num_messages / process_seconds))
+    return results
+
+
+'''
+Wall time of producer_consumers.main (one thread per producer and consumer) against the asyncio version (one
+coroutine each) for growing numbers of producers and consumers, with a short simulated I/O delay per message.
+Thread runs are skipped above `max_threads` producers.
+'''
+
+
+def benchmark_async(worker_counts=(10, 100, 1000, 10000), buffer_size=16, delay=0.01, max_threads=1000):
+    results = []
+    for num_workers in worker_counts:
+        thread_seconds = None
+        if num_workers <= max_threads:
+            # main prints every message
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                start_time = time.perf_counter()
+                producer_consumers.main(num_workers, num_workers, buffer_size, delay, delay)
+                thread_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        consumed = asyncio.run(async_producer_consumers.run(num_workers, num_workers, buffer_size, delay, delay,
+                                                            verbose=False))
+        async_seconds = time.perf_counter() - start_time
+        if consumed != 5 * num_workers:
+            raise AssertionError(f"{consumed} messages were consumed, expected {5 * num_workers}")
+        results.append((num_workers, thread_seconds, async_seconds))
+    return results
+
+
+def main():
+    print("SharedBuffer throughput (4 producers, 4 consumers, 1024 slots)")
+    print(f"{'batch size':>12} {'messages/s':>14}")
+    for batch_size in (None, 16, 256):
+        messages_per_second = benchmark_throughput(batch_size=batch_size)
+        print(f"{batch_size or 1:>12} {messages_per_second:>14,.0f}")
+
+    print()
+    print(f"CPU-bound consumers, threads with SharedBuffer vs processes with SharedMemoryBuffer "
+          f"({multiprocessing.cpu_count()} CPUs)")
+    print(f"{'workers':>12} {'threads msg/s':>14} {'processes msg/s':>16}")
+    for num_workers, thread_rate, process_rate in benchmark_workers():
+        print(f"{num_workers:>12} {thread_rate:>14,.0f} {process_rate:>16,.0f}")
+
+    print()
+    print("Threads vs asyncio, producers and consumers each (5 messages per producer, 10 ms I/O per message)")
+    print(f"{'workers':>12} {'threads (s)':>14} {'asyncio (s)':>14}")
+    for num_workers, thread_seconds, async_seconds in benchmark_async():
+        thread_column = "-" if thread_seconds is None else f"{thread_seconds:.2f}"
+        print(f"{num_workers:>12} {thread_column:>14} {async_seconds:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import sys
+import threading
+import time
+
+from producer_consumers import SharedBuffer
+
+'''
+Benchmark harness for SharedBuffer. Every combination of buffer size, producer count and consumer count is run
+with threads that do no work (or `write_time`/`read_time` seconds of simulated work per message), and one row of
+results is reported per combination:
+
+- messages per second through the buffer,
+- p50 and p99 latency from add_message to read_message of the same message,
+- total seconds producers spent blocked on notFull and consumers on notEmpty, and how many times they blocked.
+
+Results are printed as CSV or JSON so runs can be compared across changes to the buffer.
+'''
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# With `min_size` and/or `max_size`, the buffer starts at `buffer_size` and adapts its capacity between them (see
+# SharedBuffer). buffer_size must be within the bounds.
+def run_benchmark(buffer_size, producer_num, consumer_num, messages_per_producer=10000, write_time=0.0,
+                  read_time=0.0, max_size=None, max_bytes=None, min_size=None):
+    buffer = SharedBuffer(buffer_size, producer_num, consumer_num, min_size=min_size, max_size=max_size,
+                          max_bytes=max_bytes)
+    # Enqueue-to-dequeue latency of every message, in seconds, one list per consumer
+    latencies = [[] for _ in range(consumer_num)]
+
+    def produce():
+        for _ in range(messages_per_producer):
+            # Each message is the time it was added
+            buffer.add_message(time.perf_counter())
+            if write_time:
+                time.sleep(write_time)
+        buffer.producer_done()
+
+    def consume(thread_id):
+        consumer_latencies = latencies[thread_id]
+        while (enqueue_time := buffer.read_message()) is not None:
+            consumer_latencies.append(time.perf_counter() - enqueue_time)
+            if read_time:
+                time.sleep(read_time)
+
+    threads = [threading.Thread(target=produce) for _ in range(producer_num)]
+    threads += [threading.Thread(target=consume, args=(i,)) for i in range(consumer_num)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start_time
+
+    num_messages = producer_num * messages_per_producer
+    all_latencies = sorted(itertools.chain.from_iterable(latencies))
+    if len(all_latencies) != num_messages:
+        raise AssertionError(f"{len(all_latencies)} messages were read, expected {num_messages}")
+    return {
+        "buffer_size": buffer_size,
+        "producers": producer_num,
+        "consumers": consumer_num,
+        "messages": num_messages,
+        "write_time": write_time,
+        "read_time": read_time,
+        "seconds": seconds,
+        "messages_per_second": num_messages / seconds,
+        "latency_p50_us": _percentile(all_latencies, 0.5) * 1e6,
+        "latency_p99_us": _percentile(all_latencies, 0.99) * 1e6,
+        "not_full_waits": buffer.notFullWaits,
+        "not_full_wait_seconds": buffer.notFullWaitTime,
+        "not_empty_waits": buffer.notEmptyWaits,
+        "not_empty_wait_seconds": buffer.notEmptyWaitTime,
+        "final_buffer_size": buffer.size,
+        "resizes": len(buffer.resizes),
+    }
+
+
+# Whether an adaptive buffer can start at `buffer_size`
+def in_bounds(buffer_size, min_size=None, max_size=None):
+    return (min_size is None or min_size <= buffer_size) and (max_size is None or buffer_size <= max_size)
+
+
+# One run_benchmark row per combination, in grid order. Buffer sizes outside [min_size, max_size] are skipped.
+def sweep(buffer_sizes, producer_counts, consumer_counts, messages_per_producer=10000, write_time=0.0,
+          read_time=0.0, max_size=None, max_bytes=None, min_size=None):
+    buffer_sizes = [buffer_size for buffer_size in buffer_sizes if in_bounds(buffer_size, min_size, max_size)]
+    return [run_benchmark(buffer_size, producer_num, consumer_num, messages_per_producer, write_time, read_time,
+                          max_size, max_bytes, min_size)
+            for buffer_size, producer_num, consumer_num
+            in itertools.product(buffer_sizes, producer_counts, consumer_counts)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SharedBuffer over buffer sizes and thread counts.")
+    parser.add_argument("--buffer-sizes", type=int, nargs="+", default=[1, 16, 1024], help="buffer sizes to try")
+    parser.add_argument("--producers", type=int, nargs="+", default=[1, 4], help="producer counts to try")
+    parser.add_argument("--consumers", type=int, nargs="+", default=[1, 4], help="consumer counts to try")
+    parser.add_argument("--messages", type=int, default=10000, help="messages per producer")
+    parser.add_argument("--write-time", type=float, default=0.0, help="simulated work per message added, seconds")
+    parser.add_argument("--read-time", type=float, default=0.0, help="simulated work per message read, seconds")
+    parser.add_argument("--min-buffer-size", type=int,
+                        help="let the buffer shrink from each buffer size down to this size (adaptive sizing)")
+    parser.add_argument("--max-buffer-size", type=int,
+                        help="let the buffer grow from each buffer size up to this size (adaptive sizing)")
+    parser.add_argument("--max-bytes", type=int, help="cap on the total size of the messages in the buffer")
+    parser.add_argument("--format", choices=("csv", "json"), default="csv", help="output format")
+    parser.add_argument("--output", help="write the results to this file instead of stdout")
+    args = parser.parse_args()
+
+    skipped = [buffer_size for buffer_size in args.buffer_sizes
+               if not in_bounds(buffer_size, args.min_buffer_size, args.max_buffer_size)]
+    if len(skipped) == len(args.buffer_sizes):
+        parser.error("no buffer size is between --min-buffer-size and --max-buffer-size")
+    if skipped:
+        print(f"Skipping buffer sizes {skipped}, outside the adaptive sizing bounds", file=sys.stderr)
+
+    rows = sweep(args.buffer_sizes, args.producers, args.consumers, args.messages, args.write_time, args.read_time,
+                 args.max_buffer_size, args.max_bytes, args.min_buffer_size)
+
+    with open(args.output, "w", newline="") if args.output else contextlib.nullcontext(sys.stdout) as output:
+        if args.format == "json":
+            json.dump(rows, output, indent=2)
+            output.write("\n")
+        else:
+            writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
+import sys
 import threading
 import time
+from collections import deque
+from itertools import islice
 
 '''
 This program simulates a producer-consumer problem using threads. The producer-consumer problem is a 
@@ -9,81 +12,248 @@ that the producers and consumers do not interfere with each other and that the c
 '''
 
 
+'''
+The buffer is a monitor: one mutex protects it, and producers and consumers wait on two condition variables of that
+mutex, notFull and notEmpty. Every wait re-checks its condition in a loop, so a thread never acts on a wakeup that
+another thread has already used up.
+
+Shutdown is a close and drain protocol. The buffer counts down the producers as they call producer_done (or it
+is closed explicitly with close). Once it is closed, no more messages can be added, consumers keep reading
+what is left, and read_message returns None to every consumer once the buffer is empty. Closing wakes all waiting
+consumers once; no other wakeups are needed for them to exit.
+
+Adaptive sizing is optional: given `min_size` and/or `max_size`, the capacity starts at `size` and is adjusted while
+the buffer runs. Every `adapt_interval` seconds at most, when a thread has just finished waiting, the time producers
+spent blocked on notFull is compared with the time consumers spent idle on notEmpty since the last adjustment. If
+producers were blocked for longer, the capacity doubles, up to max_size. If producers never blocked and consumers were
+idle, it halves, down to min_size. The waits are only timed when a thread actually has to wait, so a buffer that never
+fills or empties pays nothing for it.
+
+With `max_bytes`, the messages in the buffer never take up more than that many bytes in total (as measured by
+sys.getsizeof, which does not follow references), whatever the capacity. Producers wait for space as they do when
+the buffer is full, and a single message larger than the cap is rejected with ValueError.
+'''
+
+
 class SharedBuffer:
-    def __init__(self, size, producers=4, consumers=10):
-        # Internal shared buffer
-        self.buffer = []
+    def __init__(self, size, producers=4, consumers=10, min_size=None, max_size=None, max_bytes=None,
+                 adapt_interval=0.05):
+        # Internal shared buffer, a deque so that reading the oldest message is O(1)
+        self.buffer = deque()
+        self.size = size
         # Mutex to protect the buffer
         self.mutex = threading.Lock()
-        # Semaphores to signal when the buffer is not empty
-        self.notEmpty = threading.Semaphore(0)
-        # Semaphores to signal when the buffer is not full
-        self.notFull = threading.Semaphore(size)
-        # Flag to signal that production is done
-        self.doneProducing = False
-        # keep track of the number of producers
+        # Condition to signal when the buffer is not empty
+        self.notEmpty = threading.Condition(self.mutex)
+        # Condition to signal when the buffer is not full
+        self.notFull = threading.Condition(self.mutex)
+        # Flag to signal that production is done and no more messages will be added
+        self.closed = False
+        # keep track of the number of producers that are still producing
         self.producers = producers
         # keep track of the number of consumers
         self.consumers = consumers
+        # Number of times and total seconds producers waited on notFull and consumers waited on notEmpty
+        self.notFullWaits = 0
+        self.notFullWaitTime = 0.0
+        self.notEmptyWaits = 0
+        self.notEmptyWaitTime = 0.0
+        # Adaptive sizing: bounds of the capacity, and the time and wait totals at the last adjustment
+        self.adaptive = min_size is not None or max_size is not None
+        self.minSize = size if min_size is None else min_size
+        self.maxSize = size if max_size is None else max_size
+        if not self.minSize <= size <= self.maxSize:
+            raise ValueError(f"size {size} is outside the bounds [{self.minSize}, {self.maxSize}]")
+        self.adaptInterval = adapt_interval
+        self.lastAdaptTime = time.perf_counter()
+        self.lastWaitTimes = (0.0, 0.0)
+        # (seconds since the buffer was created, new capacity) of every adjustment
+        self.resizes = []
+        self.startTime = self.lastAdaptTime
+        # Memory cap in bytes, and the total size of the messages in the buffer when there is one
+        self.maxBytes = max_bytes
+        self.bytes = 0
+
+    def _has_space(self, message_bytes=0):
+        if self.closed:
+            return True
+        return len(self.buffer) < self.size and (self.maxBytes is None or self.bytes + message_bytes <= self.maxBytes)
+
+    def _message_bytes(self, message):
+        if self.maxBytes is None:
+            return 0
+        message_bytes = sys.getsizeof(message)
+        if message_bytes > self.maxBytes:
+            raise ValueError(f"a message of {message_bytes} bytes can never fit in a buffer of {self.maxBytes} bytes")
+        return message_bytes
+
+    def _popleft(self):
+        message = self.buffer.popleft()
+        if self.maxBytes is not None:
+            self.bytes -= sys.getsizeof(message)
+        return message
+
+    # Grow or shrink the capacity from the waits since the last adjustment. Called with the mutex held.
+    def _adapt(self):
+        now = time.perf_counter()
+        if now - self.lastAdaptTime < self.adaptInterval:
+            return
+        blocked = self.notFullWaitTime - self.lastWaitTimes[0]
+        idle = self.notEmptyWaitTime - self.lastWaitTimes[1]
+        self.lastAdaptTime = now
+        self.lastWaitTimes = (self.notFullWaitTime, self.notEmptyWaitTime)
+
+        if blocked > idle and self.size < self.maxSize:
+            new_size = min(self.maxSize, 2 * self.size)
+            # Let in as many waiting producers as there are new slots
+            self.notFull.notify(new_size - self.size)
+        elif blocked == 0 and idle > 0 and self.size > self.minSize:
+            # Messages already in the buffer stay; producers wait until it drains below the new size
+            new_size = max(self.minSize, self.size // 2)
+        else:
+            return
+        self.size = new_size
+        self.resizes.append((now - self.startTime, new_size))
+
+    # Wait, with the mutex held, until there is space in the buffer for a message of `message_bytes` or it is closed
+    def _wait_for_space(self, message_bytes=0):
+        if self._has_space(message_bytes):
+            return
+        start_time = time.perf_counter()
+        while not self._has_space(message_bytes):
+            self.notFull.wait()
+        self.notFullWaits += 1
+        self.notFullWaitTime += time.perf_counter() - start_time
+        if self.adaptive:
+            self._adapt()
+
+    # Wait, with the mutex held, until there is a message in the buffer or it is closed
+    def _wait_for_messages(self):
+        if self.buffer or self.closed:
+            return
+        start_time = time.perf_counter()
+        while not self.buffer and not self.closed:
+            self.notEmpty.wait()
+        self.notEmptyWaits += 1
+        self.notEmptyWaitTime += time.perf_counter() - start_time
+        if self.adaptive:
+            self._adapt()
 
     '''
-    Add a message to the buffer. If the buffer is full, the producer will wait.
+    Add a message to the buffer. If the buffer is full, the producer will wait. Adding to a closed buffer raises
+    RuntimeError.
     '''
 
     def add_message(self, message):
-        # TODO: wait if buffer is full
-        self.notFull.acquire() # will decrement the semaphore value by 1 if buffer is not full or wait until it is not full
-        # not Full contains the amount of available space in the buffer
-
-        with self.mutex:
+        message_bytes = self._message_bytes(message)
+        with self.notFull:
+            # wait if buffer is full
+            self._wait_for_space(message_bytes)
+            if self.closed:
+                raise RuntimeError("add_message on a closed SharedBuffer")
             self.buffer.append(message)
-        # TODO: signal that buffer is not empty
-        self.notEmpty.release() # will increment the semaphore value by 1 and signal that buffer has a new message
-        # not empty contains the amount of messages in the buffer
+            self.bytes += message_bytes
+            # signal one consumer that buffer has a new message
+            self.notEmpty.notify()
 
     '''
-    Read a message from the buffer. If the buffer is empty, the consumer will wait.
+    Read a message from the buffer. If the buffer is empty, the consumer will wait. Returns None once the buffer is
+    closed and empty.
     '''
 
     def read_message(self):
-        message = None
-        # TODO: wait if buffer is empty
-        self.notEmpty.acquire() # not empty contains the amount of messages in the buffer
+        with self.notEmpty:
+            # wait if buffer is empty and production is not done
+            self._wait_for_messages()
+            if not self.buffer:
+                # closed and drained
+                return None
+            message = self._popleft() # reads the first message in the buffer
+            # signal one producer that there is space in the buffer
+            self.notFull.notify()
+            return message
 
+    '''
+    Add all the messages of a batch, in order, taking the mutex once for as many messages as there is space for.
+    If the buffer is full, the producer will wait. With a memory cap, a batch holding a message that can never fit
+    raises ValueError and adds nothing.
+    '''
 
-        with self.mutex:
-            # TODO: if production is done and buffer is empty, return None (check the buffer length)
-            if len(self.buffer) == 0:
-                # TODO: release the requried semaphore to avoid deadlock
-                self.notEmpty.release() # in case more consumers need to exit
-                # Return None if production is done and buffer is empty
-                return None
+    def add_messages(self, batch):
+        if not isinstance(batch, (list, tuple)):
+            batch = list(batch)
+        # Size every message first, so a message too big for the memory cap rejects the batch before any is added
+        sizes = [self._message_bytes(message) for message in batch] if self.maxBytes is not None else None
+        position = 0
+        with self.notFull:
+            while position < len(batch):
+                # wait for space for at least one message
+                if self.maxBytes is None:
+                    self._wait_for_space()
+                    if self.closed:
+                        raise RuntimeError("add_messages on a closed SharedBuffer")
+                    space = min(self.size - len(self.buffer), len(batch) - position)
+                    self.buffer.extend(islice(batch, position, position + space))
+                else:
+                    # with a memory cap, add messages one by one while they fit
+                    self._wait_for_space(sizes[position])
+                    if self.closed:
+                        raise RuntimeError("add_messages on a closed SharedBuffer")
+                    space = 0
+                    while position + space < len(batch) and self._has_space(sizes[position + space]):
+                        self.buffer.append(batch[position + space])
+                        self.bytes += sizes[position + space]
+                        space += 1
+                self.notEmpty.notify(space)
+                position += space
 
-            message = self.buffer.pop(0) # reads the first message in the buffer
-        # TODO: signal that buffer is not full
-        self.notFull.release() # increments available space in the buffer by 1
+    '''
+    Read up to max_n messages from the buffer in one go. If the buffer is empty, the consumer will wait.
+    Returns an empty list once the buffer is closed and empty, like read_message returns None.
+    '''
 
-        return message # Return the message at the front of the buffer
+    def read_messages(self, max_n):
+        with self.notEmpty:
+            self._wait_for_messages()
+            count = min(max_n, len(self.buffer))
+            messages = [self._popleft() for _ in range(count)]
+            if count:
+                self.notFull.notify(count)
+            return messages
 
     '''
-    Mark that production is done. This will be used by the producers to signal that they are done producing.
+    Called by each producer when it has added all its messages. The buffer is closed when the last one is done.
     '''
 
-    def mark_done_producing(self):
+    def producer_done(self):
+        with self.mutex:
+            self.producers -= 1
+            if self.producers == 0:
+                self._close()
+
+    '''
+    Close the buffer: no more messages can be added, and consumers return None once they have read the messages
+    that are left.
+    '''
+
+    def close(self):
         with self.mutex:
-            # TODO: set the flag to signal that production is done
-            self.doneProducing = True
+            self._close()
 
-            # Release semaphore to ensure all consumers can exit
-            # TODO: release the semaphore for each consumer (you may need to release it multiple times)
-            for i in range(self.consumers):
-                self.notEmpty.release() # will increment the semaphore value by 1 in case any consumer is busy waiting for a message 
+    def _close(self):
+        if not self.closed:
+            self.closed = True
+            # Wake every waiting consumer to drain the buffer and exit, and every waiting producer to fail
+            self.notEmpty.notify_all()
+            self.notFull.notify_all()
 
-            #pass  # Remove this line when you implement the method
+    # Kept for callers of the older API, same as close
+    def mark_done_producing(self):
+        self.close()
 
     def check_done_producing(self):
         with self.mutex:
-            return self.doneProducing and len(self.buffer) == 0
+            return self.closed and len(self.buffer) == 0
 
 
 # Shared buffer
@@ -101,9 +271,8 @@ def producer(thread_id, write_time=2):
         buffer.add_message(message)
         print(f"Producer {thread_id} produced: {message}")
         time.sleep(write_time)  # Simulate writing time (e.g., network delay, disk I/O, etc.
-    # After the last producer finishes, signal that production is done. Note that 4 is the number of producers
-    if thread_id == 4 - 1:
-        buffer.mark_done_producing()
+    # Signal that this producer is done. The buffer closes after the last one, whatever the number of producers.
+    buffer.producer_done()
 
 
 '''
@@ -116,18 +285,18 @@ def consumer(thread_id, read_time=1):
         # TODO: consume a message from the buffer
         message = buffer.read_message()
         if message is None:
-            # TODO: break the loop if production is done and buffer is empty
-            if buffer.check_done_producing():
-                break
-            #pass  # Remove this line when you implement the method
+            # production is done and the buffer is drained
+            break
         print(f"Consumer {thread_id} consumed: {message}")
         time.sleep(read_time)  # Simulate reading time
 
 
-def main(producer_num=5, consumer_num=10, buffer_size=1, read_time=2, write_time=3):
+def main(producer_num=5, consumer_num=10, buffer_size=1, read_time=2, write_time=3, max_buffer_size=None,
+         min_buffer_size=None):
     global buffer
-    # Initialize shared buffer
-    buffer = SharedBuffer(buffer_size, producer_num, consumer_num)
+    # Initialize shared buffer. With max_buffer_size and/or min_buffer_size it starts at buffer_size, grows when
+    # producers are blocked and shrinks when consumers sit idle.
+    buffer = SharedBuffer(buffer_size, producer_num, consumer_num, min_size=min_buffer_size, max_size=max_buffer_size)
 
     producers = [threading.Thread(target=producer, args=(i, write_time))
                  for i in range(producer_num)]
@@ -0,0 +1,141 @@
+import multiprocessing
+import struct
+from multiprocessing import shared_memory
+
+'''
+A producer-consumer buffer shared between processes, with the add_message/read_message API of
+producer_consumers.SharedBuffer. Messages are bytes of at most `slot_size` bytes. They are copied straight into a
+ring of fixed-size slots in a multiprocessing.shared_memory block, so they are never pickled or sent through a pipe,
+and consumers in separate processes are not limited by one GIL.
+
+Each slot holds a 4-byte length followed by up to `slot_size` bytes of payload. The block starts with a small header
+holding the head and tail positions of the ring and the number of producers still producing. Cross-process
+semaphores count the full and free slots (notEmpty and notFull), one lock serializes the producers and another the
+consumers, so a producer and a consumer never wait for each other unless the ring is full or empty.
+
+Shutdown follows SharedBuffer: each producer calls producer_done, and after the last one (or an explicit close) one
+close marker per consumer is added behind the remaining messages. A consumer that reads a marker has drained the
+buffer, and read_message returns None from then on.
+
+The buffer is passed to worker processes as a Process argument. The process that created it should call unlink
+once every worker has finished.
+'''
+
+# Header fields, one signed 64-bit counter each: head and tail positions (the ring slot is position % size), producers
+# still producing and the closed flag
+COUNTER = struct.Struct("<q")
+HEAD, TAIL, PRODUCERS, CLOSED = (i * COUNTER.size for i in range(4))
+HEADER_SIZE = 4 * COUNTER.size
+LENGTH = struct.Struct("<I")
+CLOSE_MARKER = 0xFFFFFFFF  # length of a close marker slot
+
+
+class SharedMemoryBuffer:
+    def __init__(self, size, producers=4, consumers=10, slot_size=256, context=None):
+        if slot_size >= CLOSE_MARKER:
+            raise ValueError(f"slot_size must be less than {CLOSE_MARKER}")
+        context = multiprocessing.get_context() if context is None else context
+        self.size = size
+        self.slot_size = slot_size
+        self.consumers = consumers
+        self.shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + size * (LENGTH.size + slot_size))
+        for field, value in ((HEAD, 0), (TAIL, 0), (PRODUCERS, producers), (CLOSED, 0)):
+            COUNTER.pack_into(self.shm.buf, field, value)
+        # Semaphores to signal when the buffer is not empty and not full
+        self.notEmpty = context.Semaphore(0)
+        self.notFull = context.Semaphore(size)
+        # Locks for the tail (producers) and the head (consumers) of the ring
+        self.producerLock = context.Lock()
+        self.consumerLock = context.Lock()
+        # Set in a consumer process once it has read its close marker
+        self.drained = False
+
+    def _slot_offset(self, position):
+        return HEADER_SIZE + (position % self.size) * (LENGTH.size + self.slot_size)
+
+    # Write one slot. A message (not a close marker) is refused once the buffer is closed; the flag is checked under
+    # producerLock, which close holds to set it, so no message can land behind the close markers.
+    def _put(self, length, message, close_marker=False):
+        self.notFull.acquire()
+        with self.producerLock:
+            if not close_marker and self._closed():
+                # Give the free slot back for the close markers
+                self.notFull.release()
+                raise RuntimeError("add_message on a closed SharedMemoryBuffer")
+            buf = self.shm.buf
+            tail = COUNTER.unpack_from(buf, TAIL)[0]
+            offset = self._slot_offset(tail)
+            LENGTH.pack_into(buf, offset, length)
+            if message:
+                buf[offset + LENGTH.size:offset + LENGTH.size + len(message)] = message
+            # Producers only move the tail and consumers only move the head, each under their own lock
+            COUNTER.pack_into(buf, TAIL, tail + 1)
+        self.notEmpty.release()
+
+    '''
+    Add a message (bytes) to the buffer. If the buffer is full, the producer will wait. Adding to a closed buffer
+    raises RuntimeError.
+    '''
+
+    def add_message(self, message):
+        if len(message) > self.slot_size:
+            raise ValueError(f"message of {len(message)} bytes does not fit in a {self.slot_size} byte slot")
+        self._put(len(message), message)
+
+    '''
+    Read a message from the buffer. If the buffer is empty, the consumer will wait. Returns None once the buffer is
+    closed and drained.
+    '''
+
+    def read_message(self):
+        if self.drained:
+            return None
+        self.notEmpty.acquire()
+        with self.consumerLock:
+            buf = self.shm.buf
+            head = COUNTER.unpack_from(buf, HEAD)[0]
+            offset = self._slot_offset(head)
+            length = LENGTH.unpack_from(buf, offset)[0]
+            start = offset + LENGTH.size
+            message = None if length == CLOSE_MARKER else bytes(buf[start:start + length])
+            COUNTER.pack_into(buf, HEAD, head + 1)
+        self.notFull.release()
+
+        if message is None:
+            self.drained = True
+        return message
+
+    def _closed(self):
+        return COUNTER.unpack_from(self.shm.buf, CLOSED)[0] != 0
+
+    '''
+    Called by each producer when it has added all its messages. The buffer is closed when the last one is done.
+    '''
+
+    def producer_done(self):
+        with self.producerLock:
+            producers = COUNTER.unpack_from(self.shm.buf, PRODUCERS)[0] - 1
+            COUNTER.pack_into(self.shm.buf, PRODUCERS, producers)
+        if producers == 0:
+            self.close()
+
+    '''
+    Close the buffer: no more messages can be added, and each consumer reads None after the messages that are left.
+    '''
+
+    def close(self):
+        with self.producerLock:
+            if self._closed():
+                return
+            COUNTER.pack_into(self.shm.buf, CLOSED, 1)
+        for _ in range(self.consumers):
+            self._put(CLOSE_MARKER, None, close_marker=True)
+
+    # Detach this process from the shared memory
+    def detach(self):
+        self.shm.close()
+
+    # Free the shared memory. Call once, from the process that created the buffer, after the workers are done.
+    def unlink(self):
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,44 @@
+from dining_engine import TABLES, ConflictGraph, dine
+
+'''
+Benchmarks for the tables of dining_engine. Every table feeds the same philosophers for the same time, on the ring
+of Task1/Task2 and on random conflict graphs with twice as many forks as philosophers. Thinking takes no time, so
+the philosophers are always hungry and the tables are under as much contention as they can be. Eating takes up to
+`size / 10000` seconds (at least 1 ms): all the philosophers share one interpreter, and with shorter meals for
+thousands of them the interpreter itself, not the table, decides who gets to eat. Run this file directly to print
+the results.
+
+Fairness is the ratio of the most to the fewest meals eaten by one philosopher: 1 is perfectly fair, and inf means
+some philosopher never ate during the run.
+'''
+
+
+def fairness(meals):
+    return max(meals) / min(meals) if min(meals) else float("inf")
+
+
+# Meals per second and fairness of every table on `graph`, as (table name, meals/s, fewest, most, fairness) rows
+def benchmark_tables(graph: ConflictGraph, duration=2.0, eating_time=0.001, tables=TABLES):
+    results = []
+    for name, table_class in tables.items():
+        # dine only counts the meals eaten in the `duration` after all the threads have started
+        meals = dine(table_class(graph), graph, duration, eating_time=eating_time)
+        results.append((name, sum(meals) / duration, min(meals), max(meals), fairness(meals)))
+    return results
+
+
+def main(sizes=(5, 100, 2000), duration=4.0):
+    for size in sizes:
+        eating_time = max(0.001, size / 10000)
+        graphs = ((f"ring of {size}", ConflictGraph.ring(size)),
+                  (f"random, {size} philosophers, {2 * size} forks", ConflictGraph.random(size, size, seed=size)))
+        for description, graph in graphs:
+            print(f"{description} ({duration:g} s, meals up to {eating_time * 1000:g} ms)")
+            print(f"{'table':>14} {'meals/s':>12} {'fewest':>8} {'most':>8} {'fairness':>10}")
+            for name, meals_per_second, fewest, most, ratio in benchmark_tables(graph, duration, eating_time):
+                print(f"{name:>14} {meals_per_second:>12,.0f} {fewest:>8} {most:>8} {ratio:>10.2f}")
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import random
+import threading
+import time
+from itertools import count
+
+'''
+A resource allocation engine for the dining philosophers problem on any conflict graph. Philosophers are the nodes
+of the graph and every edge is a fork shared by the two philosophers it joins; a philosopher needs all of its forks
+to eat. The ring of dining_philosophers_Task1/Task2 is the special case ConflictGraph.ring(n).
+
+A table hands out the forks. Philosophers call `acquire(id)` to get all their forks and `release(id)` to put them
+down. The tables differ in how they avoid deadlock:
+
+- GlobalMutexTable: the approach of Task1 and Task2. One mutex is held while a philosopher picks up its forks, so
+  only one philosopher picks up forks at a time, and one waiting for a busy fork blocks everybody else.
+- OrderedTable: the resource ordering of Task2 without the mutex. Every philosopher picks up its forks in
+  increasing fork number, so no cycle of waiting philosophers can form. Philosophers only wait for their neighbours.
+- WaiterTable: an arbitrator. A philosopher takes all its forks at once when they are all free and no neighbour
+  has been waiting longer, otherwise it waits and is served when its neighbours put forks down, longest waiting
+  first. The waiter's lock is only held for these checks, never while someone waits.
+- ChandyMisraTable: Chandy and Misra's hygienic solution. Forks are dirty or clean and move between the two
+  philosophers that share them on request. A philosopher gives up a dirty fork when asked unless it is eating, and
+  keeps a clean one until it has eaten, so every hungry philosopher eventually eats. Each step only locks the two
+  philosophers involved.
+'''
+
+
+class ConflictGraph:
+    def __init__(self, num_philosophers, edges):
+        self.num_philosophers = num_philosophers
+        # forks[f] is the pair of philosophers that share fork f
+        self.forks = [tuple(edge) for edge in edges]
+        # The forks of each philosopher, in the order it was given them
+        self.philosopher_forks = [[] for _ in range(num_philosophers)]
+        for fork, (a, b) in enumerate(self.forks):
+            if a == b:
+                raise ValueError(f"fork {fork} joins philosopher {a} to itself")
+            self.philosopher_forks[a].append(fork)
+            self.philosopher_forks[b].append(fork)
+
+    # The classic table: philosopher i has fork i on its left and fork i + 1 on its right
+    @classmethod
+    def ring(cls, num_philosophers):
+        graph = cls(num_philosophers, [((i - 1) % num_philosophers, i) for i in range(num_philosophers)])
+        for i in range(num_philosophers):
+            graph.philosopher_forks[i] = [i, (i + 1) % num_philosophers]
+        return graph
+
+    # A ring with `extra_forks` more forks between random pairs of philosophers
+    @classmethod
+    def random(cls, num_philosophers, extra_forks, seed=0):
+        rng = random.Random(seed)
+        edges = [((i - 1) % num_philosophers, i) for i in range(num_philosophers)]
+        while len(edges) < num_philosophers + extra_forks:
+            a, b = rng.sample(range(num_philosophers), 2)
+            edges.append((a, b))
+        return cls(num_philosophers, edges)
+
+    def neighbour(self, philosopher, fork):
+        a, b = self.forks[fork]
+        return b if a == philosopher else a
+
+    # Colour every philosopher with the smallest number not used by a neighbour that was coloured before it
+    def greedy_colouring(self):
+        colour = [None] * self.num_philosophers
+        for philosopher in range(self.num_philosophers):
+            used = {colour[self.neighbour(philosopher, fork)] for fork in self.philosopher_forks[philosopher]}
+            colour[philosopher] = next(c for c in count() if c not in used)
+        return colour
+
+
+class GlobalMutexTable:
+    def __init__(self, graph: ConflictGraph):
+        self.graph = graph
+        self.forks = [threading.Semaphore(1) for _ in graph.forks]
+        self.mutex = threading.Semaphore(1)
+
+    def acquire(self, philosopher):
+        with self.mutex:
+            for fork in self.graph.philosopher_forks[philosopher]:
+                self.forks[fork].acquire()
+
+    def release(self, philosopher):
+        for fork in self.graph.philosopher_forks[philosopher]:
+            self.forks[fork].release()
+
+
+class OrderedTable:
+    def __init__(self, graph: ConflictGraph):
+        self.graph = graph
+        self.forks = [threading.Lock() for _ in graph.forks]
+        # Every philosopher's forks in increasing order
+        self.order = [sorted(forks) for forks in graph.philosopher_forks]
+
+    def acquire(self, philosopher):
+        for fork in self.order[philosopher]:
+            self.forks[fork].acquire()
+
+    def release(self, philosopher):
+        for fork in reversed(self.order[philosopher]):
+            self.forks[fork].release()
+
+
+class WaiterTable:
+    def __init__(self, graph: ConflictGraph):
+        self.graph = graph
+        self.lock = threading.Lock()
+        self.fork_free = [True] * len(graph.forks)
+        # {philosopher: ticket} of the philosophers waiting for forks; lower tickets have waited longer
+        self.hungry = {}
+        self.tickets = count()
+        self.granted = [False] * graph.num_philosophers
+        self.conditions = [threading.Condition(self.lock) for _ in range(graph.num_philosophers)]
+
+    # All the forks are free, and no hungry neighbour has been waiting longer (which would let it starve)
+    def _can_eat(self, philosopher, ticket):
+        for fork in self.graph.philosopher_forks[philosopher]:
+            if not self.fork_free[fork]:
+                return False
+            neighbour_ticket = self.hungry.get(self.graph.neighbour(philosopher, fork))
+            if neighbour_ticket is not None and neighbour_ticket < ticket:
+                return False
+        return True
+
+    def _take_forks(self, philosopher):
+        for fork in self.graph.philosopher_forks[philosopher]:
+            self.fork_free[fork] = False
+
+    def acquire(self, philosopher):
+        with self.lock:
+            ticket = next(self.tickets)
+            if self._can_eat(philosopher, ticket):
+                self._take_forks(philosopher)
+                return
+            self.hungry[philosopher] = ticket
+            while not self.granted[philosopher]:
+                self.conditions[philosopher].wait()
+            self.granted[philosopher] = False
+
+    def release(self, philosopher):
+        with self.lock:
+            forks = self.graph.philosopher_forks[philosopher]
+            for fork in forks:
+                self.fork_free[fork] = True
+            # Serve the hungry neighbours that can now eat, longest waiting first
+            neighbours = {self.graph.neighbour(philosopher, fork) for fork in forks}
+            for neighbour in sorted((n for n in neighbours if n in self.hungry), key=self.hungry.get):
+                if self._can_eat(neighbour, self.hungry[neighbour]):
+                    self._take_forks(neighbour)
+                    del self.hungry[neighbour]
+                    self.granted[neighbour] = True
+                    self.conditions[neighbour].notify()
+
+
+THINKING, HUNGRY, EATING = range(3)
+
+
+class ChandyMisraTable:
+    def __init__(self, graph: ConflictGraph):
+        self.graph = graph
+        # Each fork starts dirty with the philosopher of the lower colour (see greedy_colouring), so the "who goes
+        # first" order has no cycles and no philosopher starts behind a long chain of others
+        colour = graph.greedy_colouring()
+        self.holder = [min(pair, key=lambda p: (colour[p], p)) for pair in graph.forks]
+        self.dirty = [True] * len(graph.forks)
+        # Set when the philosopher without the fork has asked for it and the holder owes it once it has eaten
+        self.requested = [False] * len(graph.forks)
+        self.state = [THINKING] * graph.num_philosophers
+        # A philosopher's lock protects its state and the forks it holds; moving a fork locks both philosophers
+        self.locks = [threading.Lock() for _ in range(graph.num_philosophers)]
+        # Signalled when a fork arrives
+        self.conditions = [threading.Condition(lock) for lock in self.locks]
+
+    # Lock two philosophers, always in the same order
+    def _lock_pair(self, a, b):
+        first, second = (a, b) if a < b else (b, a)
+        self.locks[first].acquire()
+        self.locks[second].acquire()
+        return first, second
+
+    def _unlock_pair(self, first, second):
+        self.locks[second].release()
+        self.locks[first].release()
+
+    # Move a fork to `receiver`, cleaning it. Called with both philosophers locked.
+    def _pass_fork(self, fork, receiver):
+        giver = self.holder[fork]
+        self.holder[fork] = receiver
+        self.dirty[fork] = False
+        # A hungry philosopher that gives up a fork still needs it, so it asks for it back
+        self.requested[fork] = self.state[giver] == HUNGRY
+        self.conditions[receiver].notify()
+
+    def acquire(self, philosopher):
+        with self.locks[philosopher]:
+            self.state[philosopher] = HUNGRY
+        forks = self.graph.philosopher_forks[philosopher]
+
+        # Ask for every missing fork. The holder hands over a dirty fork unless it is eating, and otherwise owes it.
+        for fork in forks:
+            neighbour = self.graph.neighbour(philosopher, fork)
+            pair = self._lock_pair(philosopher, neighbour)
+            try:
+                if self.holder[fork] == neighbour:
+                    if self.dirty[fork] and self.state[neighbour] != EATING:
+                        self._pass_fork(fork, philosopher)
+                    else:
+                        self.requested[fork] = True
+            finally:
+                self._unlock_pair(*pair)
+
+        # Every missing fork is now owed to this philosopher and arrives with a notification
+        with self.conditions[philosopher]:
+            while any(self.holder[fork] != philosopher for fork in forks):
+                self.conditions[philosopher].wait()
+            self.state[philosopher] = EATING
+
+    def release(self, philosopher):
+        forks = self.graph.philosopher_forks[philosopher]
+        with self.locks[philosopher]:
+            self.state[philosopher] = THINKING
+            for fork in forks:
+                self.dirty[fork] = True
+        # Hand over the forks that were asked for while eating
+        for fork in forks:
+            neighbour = self.graph.neighbour(philosopher, fork)
+            pair = self._lock_pair(philosopher, neighbour)
+            try:
+                if self.requested[fork] and self.holder[fork] == philosopher:
+                    self._pass_fork(fork, neighbour)
+            finally:
+                self._unlock_pair(*pair)
+
+
+TABLES = {
+    "mutex": GlobalMutexTable,
+    "ordered": OrderedTable,
+    "waiter": WaiterTable,
+    "chandy-misra": ChandyMisraTable,
+}
+
+'''
+Let every philosopher of `graph` think and eat for `duration` seconds, with forks handed out by `table`.
+Thinking and eating take a random time up to `thinking_time` and `eating_time` seconds (0 for none). Returns the
+number of meals of each philosopher finished within the `duration`, counted from when all the threads are running.
+Raises AssertionError if two neighbours ever eat at the same time.
+'''
+
+
+def dine(table, graph: ConflictGraph, duration=1.0, thinking_time=0.0, eating_time=0.001, seed=0):
+    start = threading.Event()
+    stop = threading.Event()
+    meals = [0] * graph.num_philosophers
+    fork_users = [None] * len(graph.forks)
+    errors = []
+
+    def philosopher(id):
+        rng = random.Random(seed * 1000003 + id)
+        forks = graph.philosopher_forks[id]
+        start.wait()
+        while not stop.is_set():
+            if thinking_time:
+                time.sleep(rng.uniform(0, thinking_time))
+            table.acquire(id)
+            for fork in forks:
+                if fork_users[fork] is not None:
+                    errors.append(f"Philosophers {fork_users[fork]} and {id} hold fork {fork} at the same time")
+                fork_users[fork] = id
+            if eating_time:
+                time.sleep(rng.uniform(0, eating_time))
+            if not stop.is_set():
+                meals[id] += 1
+            for fork in forks:
+                fork_users[fork] = None
+            table.release(id)
+
+    threads = [threading.Thread(target=philosopher, args=(i,)) for i in range(graph.num_philosophers)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise AssertionError(errors[0])
+    return meals
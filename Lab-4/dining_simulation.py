@@ -0,0 +1,286 @@
+import argparse
+import contextlib
+import csv
+import heapq
+import json
+import random
+import sys
+from collections import Counter, deque
+
+'''
+A discrete-event simulation of the fork protocols of dining_philosophers_Task1 and Task2. Instead of sleeping, the
+simulation keeps a virtual clock and jumps from one event (a philosopher getting hungry or finishing a meal) to the
+next, so millions of meals take seconds, and a seeded random number generator makes every run reproducible.
+
+Thinking and eating take random.randint(1, thinking_time) and random.randint(1, eating_time) virtual seconds, as in
+the threaded versions. Picking up the mutex or a fork takes `pickup_time` virtual seconds (0 by default, so a
+philosopher that finds everything free picks it all up at once). The mutex and the forks are semaphores whose
+waiters are served first come, first served. The protocols are:
+
+- task1: take the mutex, the left fork, the right fork, release the mutex.
+- task2: take the mutex, then the lower numbered fork first (the last philosopher takes the higher one first),
+  release the mutex.
+- ordered: Task2's fork order without the mutex.
+- naive: the left fork then the right fork without the mutex, which can deadlock once picking up takes time.
+
+Every philosopher's waits (from getting hungry to holding both forks) are counted per whole virtual second. A
+philosopher starves if it waited, or is still waiting at the end, longer than the starvation threshold. If every
+philosopher is stuck waiting the simulation stops and reports a deadlock.
+'''
+
+# Resource number of the mutex; forks are 0 to philosophers - 1
+MUTEX = -1
+ACQUIRE, RELEASE = 0, 1
+PROTOCOLS = ("task1", "task2", "ordered", "naive")
+
+
+def _fork_order(protocol, id, philosophers):
+    left_fork = id
+    right_fork = (id + 1) % philosophers
+    if protocol in ("task1", "naive"):
+        return left_fork, right_fork
+    fork_one = min(left_fork, right_fork)
+    fork_two = max(left_fork, right_fork)
+    # Only in Task2 itself: the last philosopher takes the larger fork first
+    if protocol == "task2" and id == philosophers - 1:
+        fork_one, fork_two = fork_two, fork_one
+    return fork_one, fork_two
+
+
+# The steps of a philosopher getting hungry until it eats, and of putting down its forks after eating
+def protocol_steps(protocol, id, philosophers):
+    if protocol not in PROTOCOLS:
+        raise ValueError(f"unknown protocol {protocol!r}, expected one of {', '.join(PROTOCOLS)}")
+    fork_one, fork_two = _fork_order(protocol, id, philosophers)
+    pick_up = [(ACQUIRE, fork_one), (ACQUIRE, fork_two)]
+    if protocol in ("task1", "task2"):
+        pick_up = [(ACQUIRE, MUTEX)] + pick_up + [(RELEASE, MUTEX)]
+    put_down = [(RELEASE, fork_one), (RELEASE, fork_two)]
+    return pick_up, put_down
+
+
+def _percentile(counts: Counter, q):
+    total = sum(counts.values())
+    if not total:
+        return 0
+    rank = min(total - 1, int(q * total))
+    for value in sorted(counts):
+        rank -= counts[value]
+        if rank < 0:
+            return value
+    return max(counts)
+
+
+class DiningSimulation:
+    def __init__(self, philosophers=5, protocol="task1", thinking_time=1, eating_time=5, seed=0,
+                 starvation_threshold=None, pickup_time=0):
+        self.philosophers = philosophers
+        self.protocol = protocol
+        self.thinking_time = thinking_time
+        self.eating_time = eating_time
+        self.pickup_time = pickup_time
+        # Longer than every other philosopher eating once in turn, by default
+        self.starvation_threshold = (philosophers * eating_time if starvation_threshold is None
+                                     else starvation_threshold)
+        self.random = random.Random(seed).random
+        self.steps = [protocol_steps(protocol, id, philosophers) for id in range(philosophers)]
+
+        self.now = 0
+        # (time, sequence number, philosopher) of every philosopher that is thinking or eating; the sequence number
+        # keeps events at the same time in a fixed order
+        self.events = []
+        self.sequence = 0
+        # Holder and first come, first served queue of waiting philosophers of every resource
+        self.owner = {resource: None for resource in range(MUTEX, philosophers)}
+        self.waiting = {resource: deque() for resource in range(MUTEX, philosophers)}
+        # Which pick up step each hungry philosopher is at next, None while thinking, and True while eating
+        self.step = [None] * philosophers
+        self.hungry_since = [0] * philosophers
+        self.meals = [0] * philosophers
+        self.waits = [Counter() for _ in range(philosophers)]
+        self.total_meals = 0
+        self.deadlock_time = None
+
+        for id in range(philosophers):
+            self._schedule(id, self._duration(thinking_time))
+
+    # random.randint(1, maximum) without its overhead
+    def _duration(self, maximum):
+        return 1 + int(self.random() * maximum)
+
+    def _schedule(self, id, delay):
+        heapq.heappush(self.events, (self.now + delay, self.sequence, id))
+        self.sequence += 1
+
+    # Hand `resource` to the next philosopher waiting for it, who can then carry on picking up
+    def _release(self, resource, ready):
+        if self.waiting[resource]:
+            id = self.waiting[resource].popleft()
+            self.owner[resource] = id
+            self._picked_up(id, self.step[id] + 1, ready)
+        else:
+            self.owner[resource] = None
+
+    # `id` picked up a resource; it carries on with `step` now, or once picking up is done
+    def _picked_up(self, id, step, ready):
+        self.step[id] = step
+        if self.pickup_time:
+            self._schedule(id, self.pickup_time)
+        else:
+            ready.append(id)
+
+    # Carry on with the pick up steps of `id` until it waits for a resource or starts eating
+    def _pick_up(self, id, ready):
+        pick_up = self.steps[id][0]
+        step = self.step[id]
+        while step < len(pick_up):
+            action, resource = pick_up[step]
+            if action == RELEASE:
+                self._release(resource, ready)
+            elif self.owner[resource] is None:
+                self.owner[resource] = id
+                if self.pickup_time:
+                    self._picked_up(id, step + 1, ready)
+                    return
+            else:
+                self.step[id] = step
+                self.waiting[resource].append(id)
+                return
+            step += 1
+        self.step[id] = True
+        self.waits[id][self.now - self.hungry_since[id]] += 1
+        self._schedule(id, self._duration(self.eating_time))
+
+    '''
+    Run the simulation until `meals` more meals have been eaten or the clock passes `until`, whichever comes first
+    (either can be None). Stops early on a deadlock. Can be called again to carry on.
+    '''
+
+    def run(self, meals=1000000, until=None):
+        stop_meals = None if meals is None else self.total_meals + meals
+        events = self.events
+        ready = deque()
+        while events:
+            if stop_meals is not None and self.total_meals >= stop_meals:
+                break
+            if until is not None and events[0][0] > until:
+                self.now = until
+                break
+            self.now, _, id = heapq.heappop(events)
+            if self.step[id] is True:
+                # Finished eating: put down the forks and think
+                for _, resource in self.steps[id][1]:
+                    self._release(resource, ready)
+                self.meals[id] += 1
+                self.total_meals += 1
+                self.step[id] = None
+                self._schedule(id, self._duration(self.thinking_time))
+            elif self.step[id] is None:
+                # Finished thinking
+                self.hungry_since[id] = self.now
+                self.step[id] = 0
+                ready.append(id)
+            else:
+                # Finished picking up a resource
+                ready.append(id)
+            while ready:
+                self._pick_up(ready.popleft(), ready)
+        else:
+            # Nobody is thinking, eating or picking up, so everybody waits for a fork another waiting philosopher holds
+            self.deadlock_time = self.now
+        return self
+
+    # How long `id` has been hungry, 0 while thinking or eating
+    def current_wait(self, id):
+        step = self.step[id]
+        if step is None or step is True:
+            return 0
+        return self.now - self.hungry_since[id]
+
+    def starving(self):
+        return [id for id in range(self.philosophers)
+                if max(self.waits[id], default=0) > self.starvation_threshold
+                or self.current_wait(id) > self.starvation_threshold]
+
+    # One row per philosopher: meals and the distribution of its waits, in virtual seconds
+    def metrics(self):
+        rows = []
+        starving = set(self.starving())
+        for id in range(self.philosophers):
+            waits = self.waits[id]
+            num_waits = sum(waits.values())
+            rows.append({
+                "philosopher": id,
+                "meals": self.meals[id],
+                "mean_wait": sum(wait * count for wait, count in waits.items()) / num_waits if num_waits else 0.0,
+                "p50_wait": _percentile(waits, 0.5),
+                "p90_wait": _percentile(waits, 0.9),
+                "p99_wait": _percentile(waits, 0.99),
+                "max_wait": max(waits, default=0),
+                "current_wait": self.current_wait(id),
+                "starving": id in starving,
+            })
+        return rows
+
+    def summary(self):
+        all_waits = sum(self.waits, Counter())
+        return {
+            "protocol": self.protocol,
+            "philosophers": self.philosophers,
+            "virtual_seconds": self.now,
+            "meals": self.total_meals,
+            "fewest_meals": min(self.meals),
+            "most_meals": max(self.meals),
+            "p50_wait": _percentile(all_waits, 0.5),
+            "p99_wait": _percentile(all_waits, 0.99),
+            "max_wait": max(all_waits, default=0),
+            "starvation_threshold": self.starvation_threshold,
+            "starving": self.starving(),
+            "deadlock_time": self.deadlock_time,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the dining philosophers on a virtual clock.")
+    parser.add_argument("--protocol", choices=PROTOCOLS, default="task1", help="fork protocol to simulate")
+    parser.add_argument("--philosophers", type=int, default=5, help="number of philosophers and forks")
+    parser.add_argument("--thinking-time", type=int, default=1, help="longest thinking time, virtual seconds")
+    parser.add_argument("--eating-time", type=int, default=5, help="longest eating time, virtual seconds")
+    parser.add_argument("--pickup-time", type=int, default=0,
+                        help="time to pick up the mutex or a fork, virtual seconds")
+    parser.add_argument("--meals", type=int, default=1000000, help="stop after this many meals")
+    parser.add_argument("--until", type=int, help="stop when the virtual clock passes this time")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--starvation-threshold", type=int,
+                        help="waits longer than this many virtual seconds count as starvation "
+                             "(default: philosophers * eating time)")
+    parser.add_argument("--format", choices=("csv", "json"), default="csv", help="output format")
+    parser.add_argument("--output", help="write the per-philosopher results to this file instead of stdout")
+    args = parser.parse_args()
+
+    simulation = DiningSimulation(args.philosophers, args.protocol, args.thinking_time, args.eating_time, args.seed,
+                                  args.starvation_threshold, args.pickup_time)
+    simulation.run(args.meals, args.until)
+    rows = simulation.metrics()
+
+    with open(args.output, "w", newline="") if args.output else contextlib.nullcontext(sys.stdout) as output:
+        if args.format == "json":
+            json.dump({"summary": simulation.summary(), "philosophers": rows}, output, indent=2)
+            output.write("\n")
+        else:
+            writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    summary = simulation.summary()
+    print(f"{summary['meals']} meals in {summary['virtual_seconds']} virtual seconds, "
+          f"{summary['fewest_meals']} to {summary['most_meals']} per philosopher", file=sys.stderr)
+    if summary["deadlock_time"] is not None:
+        print(f"Deadlock at virtual time {summary['deadlock_time']}", file=sys.stderr)
+    if summary["starving"]:
+        print(f"Philosophers {summary['starving']} waited longer than {summary['starvation_threshold']} "
+              f"virtual seconds", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
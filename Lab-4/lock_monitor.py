@@ -0,0 +1,227 @@
+import argparse
+import contextlib
+import csv
+import importlib
+import json
+import sys
+import threading
+import time
+
+'''
+Instrumented semaphores for the forks and the mutex of dining_philosophers_Task1/Task2, to see why a run stalls.
+
+InstrumentedSemaphore behaves like threading.Semaphore and records, per semaphore, how often it was acquired, how
+often a thread had to wait for it, and the total and longest wait and hold times. All the semaphores of a run share
+a LockMonitor, which keeps the wait-for graph: which threads hold each semaphore and which semaphore each blocked
+thread waits for. Every time a thread is about to block, the monitor follows the graph from that thread; if it
+comes back to it, the threads on the way are deadlocked and the monitor reports them straight away.
+
+An acquire that does not have to wait only takes the semaphore and notes the time and owner; the monitor's lock is
+only taken by threads that are about to block anyway, so the instrumentation can stay on in long runs.
+
+Run this file to play Task1 or Task2 with instrumented semaphores and print or save the statistics at the end.
+The philosophers print to stdout, so the statistics go to stderr, or to a file with --stats, where they can be
+read without the philosophers' messages in between.
+'''
+
+
+class DeadlockError(RuntimeError):
+    pass
+
+
+class LockMonitor:
+    def __init__(self, raise_on_deadlock=False, on_deadlock=None):
+        self.lock = threading.Lock()
+        self.semaphores = []
+        # {thread ident: semaphore it is blocked on}
+        self.waiting = {}
+        # Each deadlock found, as a list of (thread ident, semaphore held, semaphore waited for) around the cycle
+        self.deadlocks = []
+        # Set once a deadlock was found
+        self.deadlocked = threading.Event()
+        self.raise_on_deadlock = raise_on_deadlock
+        self.on_deadlock = self.print_deadlock if on_deadlock is None else on_deadlock
+
+    def semaphore(self, name, value=1):
+        semaphore = InstrumentedSemaphore(name, value, self)
+        self.semaphores.append(semaphore)
+        return semaphore
+
+    # The cycle of the wait-for graph through `thread`, or None. Called with the monitor's lock held.
+    def _find_cycle(self, thread):
+        path = []
+        visited = set()
+
+        # Depth first from `current`, which waits for `semaphore`
+        def visit(current, semaphore):
+            for owner, _ in list(semaphore.owners):
+                path.append((current, owner, semaphore))
+                if owner == thread:
+                    return True
+                if owner not in visited and owner in self.waiting:
+                    visited.add(owner)
+                    if visit(owner, self.waiting[owner]):
+                        return True
+                path.pop()
+            return False
+
+        if not visit(thread, self.waiting[thread]):
+            return None
+        # Each thread on the cycle holds the semaphore the previous one waits for
+        return [(current, path[i - 1][2], semaphore) for i, (current, _, semaphore) in enumerate(path)]
+
+    # Record that the calling thread is about to block on `semaphore`, and look for a deadlock
+    def _block(self, thread, semaphore):
+        with self.lock:
+            self.waiting[thread] = semaphore
+            cycle = self._find_cycle(thread)
+            if cycle is not None:
+                self.deadlocks.append(cycle)
+                if self.raise_on_deadlock:
+                    del self.waiting[thread]
+        if cycle is not None:
+            self.deadlocked.set()
+            self.on_deadlock(cycle)
+            if self.raise_on_deadlock:
+                raise DeadlockError(self.describe(cycle))
+
+    def _unblock(self, thread):
+        with self.lock:
+            del self.waiting[thread]
+
+    def describe(self, cycle):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        return "; ".join(f"{names.get(thread, thread)} holds {held.name} and waits for {wanted.name}"
+                         for thread, held, wanted in cycle)
+
+    def print_deadlock(self, cycle):
+        print(f"Deadlock: {self.describe(cycle)}", file=sys.stderr)
+
+    # One row of contention statistics per semaphore, times in seconds
+    def stats(self):
+        return [semaphore.stats() for semaphore in self.semaphores]
+
+    # Write the statistics to `path`, or to stderr if there is none
+    def write_stats(self, path=None, stats_format="csv"):
+        rows = self.stats()
+        with open(path, "w", newline="") if path else contextlib.nullcontext(sys.stderr) as output:
+            if stats_format == "json":
+                json.dump(rows, output, indent=2)
+                output.write("\n")
+            else:
+                writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+
+
+class InstrumentedSemaphore:
+    def __init__(self, name, value=1, monitor=None):
+        self.name = name
+        self.monitor = LockMonitor() if monitor is None else monitor
+        self.semaphore = threading.Semaphore(value)
+        # [thread ident, time acquired] of every thread holding the semaphore
+        self.owners = []
+        self.acquisitions = 0
+        self.contended = 0
+        self.waitTime = 0.0
+        self.maxWaitTime = 0.0
+        self.holdTime = 0.0
+        self.maxHoldTime = 0.0
+
+    def acquire(self, blocking=True, timeout=None):
+        thread = threading.get_ident()
+        if not self.semaphore.acquire(False):
+            if not blocking:
+                return False
+            # The slow path: this thread is about to wait
+            self.monitor._block(thread, self)
+            start_time = time.perf_counter()
+            try:
+                acquired = self.semaphore.acquire(True, timeout)
+            finally:
+                self.monitor._unblock(thread)
+            wait_time = time.perf_counter() - start_time
+            self.contended += 1
+            self.waitTime += wait_time
+            self.maxWaitTime = max(self.maxWaitTime, wait_time)
+            if not acquired:
+                return False
+        self.acquisitions += 1
+        self.owners.append([thread, time.perf_counter()])
+        return True
+
+    def release(self):
+        thread = threading.get_ident()
+        # A semaphore can be released by a thread that does not hold it; then the longest holder gives it up
+        for position, (owner, _) in enumerate(self.owners):
+            if owner == thread:
+                break
+        else:
+            position = 0
+        if self.owners:
+            hold_time = time.perf_counter() - self.owners.pop(position)[1]
+            self.holdTime += hold_time
+            self.maxHoldTime = max(self.maxHoldTime, hold_time)
+        self.semaphore.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "wait_seconds": self.waitTime,
+            "max_wait_seconds": self.maxWaitTime,
+            "hold_seconds": self.holdTime,
+            "max_hold_seconds": self.maxHoldTime,
+            "holders": len(self.owners),
+        }
+
+
+'''
+Replace the forks and mutex of a Task1/Task2 module with InstrumentedSemaphores sharing `monitor`. The philosopher
+functions look the globals up on every call, so this has to happen before the threads start. With `no_mutex` the
+mutex lets every philosopher through, as if there were none.
+'''
+
+
+def instrument(module, monitor: LockMonitor, no_mutex=False):
+    module.forks = [monitor.semaphore(f"fork {i}") for i in range(module.PHILOSOPHERS_COUNT)]
+    module.mutex = monitor.semaphore("mutex", module.PHILOSOPHERS_COUNT if no_mutex else 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the dining philosophers with instrumented semaphores.")
+    parser.add_argument("--task", choices=("1", "2"), default="1", help="which task's philosophers to run")
+    parser.add_argument("--duration", type=float, default=30,
+                        help="seconds to let the philosophers run before reporting (Task1 never finishes)")
+    parser.add_argument("--no-mutex", action="store_true", help="run without the mutex, which can deadlock")
+    parser.add_argument("--stats", help="write the statistics to this file instead of stderr")
+    parser.add_argument("--stats-format", choices=("csv", "json"), default="csv", help="statistics format")
+    args = parser.parse_args()
+
+    module = importlib.import_module(f"dining_philosophers_Task{args.task}")
+    monitor = LockMonitor()
+    instrument(module, monitor, args.no_mutex)
+
+    # Daemon threads, so a run that deadlocked can still exit
+    philosophers = [threading.Thread(target=module.philosopher, args=(i,), daemon=True)
+                    for i in range(module.PHILOSOPHERS_COUNT)]
+    for p in philosophers:
+        p.start()
+    # Stop at the end of the duration, when a deadlock is found, or when every philosopher is done (Task2)
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline and not monitor.deadlocked.is_set() and any(p.is_alive() for p in philosophers):
+        monitor.deadlocked.wait(0.1)
+
+    monitor.write_stats(args.stats, args.stats_format)
+    if monitor.deadlocks:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+import contextlib
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from paging_policies import ARCPolicy, ClockPolicy, LRUPolicy, OPTPolicy
+from paging_reports import FaultHistogramReporter, FaultLogReporter
+from paging_working_sets import (MemoryPage, MultiprogrammingMemoryManager, PageFrame, PageTable, ReferenceClock,
+                                 ReferenceString, Reporter, TLBCache, WorkingSetPageReplacementAlgorithm,
+                                 WorkingSetPolicy)
+
+'''
+Benchmarks for the working set paging simulator. Run this file directly to print the results.
+'''
+
+
+'''
+The original victim selection: one pass over the frames to collect the pages outside the working set, a second
+pass over those for the oldest one and, if there were none, a third pass for the oldest page overall.
+Kept here as the reference the heap-based selection is checked against.
+'''
+
+
+class ScanWorkingSetPageReplacementAlgorithm(WorkingSetPageReplacementAlgorithm):
+    def select_victim(self, virtual_page):
+        current_time = self.clock.now()
+        working_set = []
+        for i, frame in enumerate(self.page_frame.frames):
+            if frame is not None and (current_time - frame.last_referenced_time) > self.time_window:
+                working_set.append(i)
+
+        frame_to_replace = None
+        oldest_frame_time = float('inf')
+        if not working_set:
+            for i, frame in enumerate(self.page_frame.frames):
+                if frame is not None and frame.last_referenced_time < oldest_frame_time:
+                    oldest_frame_time = frame.last_referenced_time
+                    frame_to_replace = i
+        else:
+            for frame in working_set:
+                if self.page_frame.frames[frame].last_referenced_time < oldest_frame_time:
+                    oldest_frame_time = self.page_frame.frames[frame].last_referenced_time
+                    frame_to_replace = frame
+        return frame_to_replace
+
+
+# Algorithms built here do not report their page faults
+def build_algorithm(num_frames, time_window=0.0, algorithm_class=WorkingSetPageReplacementAlgorithm, clock=None):
+    page_frame = PageFrame(num_frames)
+    page_table = PageTable()
+    tlb_cache = TLBCache(size=num_frames)
+    return algorithm_class(page_frame, page_table, tlb_cache, time_window, clock, reporter=Reporter())
+
+
+def fill_memory(algorithm, num_pages):
+    # Load `num_pages` distinct pages so that every frame and page table entry is in use
+    for i in range(num_pages):
+        page = MemoryPage(virtual_address=f"page{i}", content=f"Page {i}")
+        physical_frame = algorithm.try_allocate(page)
+        algorithm.map_page(page.virtual_address, physical_frame)
+
+
+'''
+Page fault throughput as the page table grows. Every fault evicts a page, so this measures the cost of
+victim selection plus the page table and TLB updates that go with it.
+'''
+
+
+def benchmark_page_faults(table_sizes=(1000, 2000, 4000, 8000), num_faults=2000):
+    results = []
+    for table_size in table_sizes:
+        algorithm = build_algorithm(table_size)
+        fill_memory(algorithm, table_size)
+
+        new_pages = [MemoryPage(virtual_address=f"new_page{i}", content=f"New page {i}")
+                     for i in range(num_faults)]
+
+        start_time = time.perf_counter()
+        for page in new_pages:
+            physical_frame = algorithm.replace_page(page)
+            algorithm.map_page(page.virtual_address, physical_frame)
+        end_time = time.perf_counter()
+
+        results.append((table_size, num_faults / (end_time - start_time)))
+    return results
+
+
+'''
+TLB hit path throughput for growing TLB sizes. Every lookup is a hit, so the LRU bookkeeping is all that is measured.
+'''
+
+
+def benchmark_tlb_lookups(tlb_sizes=(16, 256, 4096, 65536), num_lookups=200000):
+    results = []
+    for tlb_size in tlb_sizes:
+        tlb_cache = TLBCache(size=tlb_size)
+        for i in range(tlb_size):
+            tlb_cache.insert(f"page{i}", i)
+        lookups = [f"page{i % tlb_size}" for i in range(num_lookups)]
+
+        start_time = time.perf_counter()
+        for virtual_page in lookups:
+            tlb_cache.lookup(virtual_page)
+        end_time = time.perf_counter()
+
+        results.append((tlb_size, num_lookups / (end_time - start_time)))
+    return results
+
+
+'''
+Replay the same reference trace through the scan-based and the heap-based victim selection and check that every
+reference ends up in the same frame. The reference clock only ticks every few references so that ties between
+timestamps are common, and an infinite time window covers the case where no page is outside the working set.
+'''
+
+
+def compare_victim_selection(num_frames=64, num_pages=256, num_references=20000, time_window=0, seed=0,
+                             references_per_tick=8):
+    rng = random.Random(seed)
+    trace = [rng.randrange(num_pages) for _ in range(num_references)]
+
+    frame_sequences = []
+    for algorithm_class in (ScanWorkingSetPageReplacementAlgorithm, WorkingSetPageReplacementAlgorithm):
+        clock = ReferenceClock()
+        algorithm = build_algorithm(num_frames, time_window, algorithm_class, clock)
+        frame_sequence = []
+        for i, page_number in enumerate(trace):
+            if i % references_per_tick == 0:
+                clock.tick()
+            page = MemoryPage(virtual_address=f"page{page_number}", content=f"Page {page_number}")
+            physical_frame = algorithm.try_allocate(page)
+            if physical_frame == -1:
+                physical_frame = algorithm.replace_page(page)
+            algorithm.map_page(page.virtual_address, physical_frame)
+            frame_sequence.append(physical_frame)
+        frame_sequences.append(frame_sequence)
+
+    scan_frames, heap_frames = frame_sequences
+    for i, (scan_frame, heap_frame) in enumerate(zip(scan_frames, heap_frames)):
+        if scan_frame != heap_frame:
+            raise AssertionError(
+                f"Reference {i} went to frame {heap_frame}, the scan-based selection chose frame {scan_frame}")
+    return len(trace)
+
+
+'''
+Prefetch pages, then reference new ones, and check that the prefetched pages are evicted like any others: with
+half of memory prefetched the prefetched frames are the first victims, and with all of it prefetched every frame
+is a victim once. Also checks that a reference to a prefetched page is not a page fault.
+'''
+
+
+def check_prefetch_eviction(num_frames=4):
+    for num_prefetched in (num_frames // 2, num_frames):
+        clock = ReferenceClock()
+        algorithm = build_algorithm(num_frames, clock=clock)
+        prefetched = [MemoryPage(f"prefetched{i}", f"Prefetched {i}") for i in range(num_prefetched)]
+        prefetched_frames = algorithm.prefetch(prefetched)
+        if len(prefetched_frames) != num_prefetched:
+            raise AssertionError(f"Prefetched {len(prefetched_frames)} of {num_prefetched} pages")
+
+        clock.tick()
+        if algorithm.try_allocate(prefetched[0]) != prefetched_frames[0] or algorithm.page_faults:
+            raise AssertionError("A reference to a prefetched page was not found in memory")
+
+        victims = []
+        for i in range(num_frames):
+            clock.tick()
+            page = MemoryPage(f"new{i}", f"New {i}")
+            physical_frame = algorithm.try_allocate(page)
+            if physical_frame == -1:
+                physical_frame = algorithm.replace_victim(page)
+                victims.append(physical_frame)
+            algorithm.map_page(page.virtual_address, physical_frame)
+        # The first prefetched page was referenced again, so it is the last of them to go
+        expected = prefetched_frames[1:] + prefetched_frames[:1]
+        if victims[:num_prefetched] != expected:
+            raise AssertionError(f"Evicted frames {victims}, expected the prefetched frames {expected} first")
+    return num_frames
+
+
+# A synthetic trace of (program_id, virtual_page) records. Each program mostly references its low-numbered pages,
+# with an exponentially decreasing chance of touching higher ones.
+def generate_trace(num_references, num_programs=4, mean_page=200, seed=0):
+    rng = random.Random(seed)
+    return [(rng.randrange(num_programs), int(rng.expovariate(1 / mean_page))) for _ in range(num_references)]
+
+
+'''
+References per second for the object-based engine (MultiprogrammingMemoryManager.simulate_trace) and the NumPy
+engine on the same trace. Also checks that both engines report the same page faults for every program.
+'''
+
+
+def benchmark_engines(num_references=500000, num_frames=256, time_window=1000, mean_page=20):
+    try:
+        from paging_vectorized import VectorizedWorkingSetSimulator
+    except ImportError:
+        print("NumPy is not installed, skipping the engine comparison")
+        return []
+
+    trace = generate_trace(num_references, mean_page=mean_page)
+
+    manager = MultiprogrammingMemoryManager(
+        num_programs=0, program_pages=None, num_frames=num_frames, time_window=time_window, clock=ReferenceClock(),
+        reporter=Reporter())
+    start_time = time.perf_counter()
+    manager.simulate_trace(trace)
+    object_seconds = time.perf_counter() - start_time
+
+    simulator = VectorizedWorkingSetSimulator(num_frames, time_window)
+    start_time = time.perf_counter()
+    simulator.simulate_trace(trace)
+    vectorized_seconds = time.perf_counter() - start_time
+
+    if manager.program_page_faults != simulator.program_page_faults:
+        raise AssertionError(f"Page faults differ: object engine {manager.program_page_faults}, "
+                             f"NumPy engine {simulator.program_page_faults}")
+    fault_rate = sum(simulator.program_page_faults) / num_references
+    return [("object", num_references / object_seconds, fault_rate),
+            ("numpy", num_references / vectorized_seconds, fault_rate)]
+
+
+'''
+Page faults and references per second for every replacement policy on the same trace.
+'''
+
+
+def compare_policies(num_references=200000, num_frames=256, time_window=1000, mean_page=40):
+    trace = generate_trace(num_references, mean_page=mean_page)
+    policies = [
+        ("working set", WorkingSetPolicy(time_window)),
+        ("LRU", LRUPolicy()),
+        ("CLOCK", ClockPolicy()),
+        ("ARC", ARCPolicy()),
+        ("OPT", OPTPolicy(trace)),
+    ]
+
+    results = []
+    for name, policy in policies:
+        manager = MultiprogrammingMemoryManager(
+            num_programs=0, program_pages=None, num_frames=num_frames, time_window=time_window,
+            clock=ReferenceClock(), policy=policy, reporter=Reporter())
+        start_time = time.perf_counter()
+        manager.simulate_trace(trace)
+        end_time = time.perf_counter()
+        results.append((name, sum(manager.program_page_faults), num_references / (end_time - start_time)))
+    return results
+
+
+# MemoryPage as it was before it had slots: every instance carries its own __dict__ and strings
+class DictMemoryPage:
+    def __init__(self, virtual_address, content, last_referenced_time=None):
+        self.content = content
+        self.virtual_address = virtual_address
+        self.last_referenced_time = last_referenced_time if last_referenced_time is not None else time.time()
+
+
+'''
+Bytes per reference, measured with tracemalloc, for a reference string built the way main() builds one (new
+strings for every reference) and stored as a list of dict-based pages, a list of slotted MemoryPage objects, or a
+ReferenceString.
+'''
+
+
+def benchmark_reference_memory(num_references=200000, num_pages=1000, seed=0):
+    rng = random.Random(seed)
+    page_numbers = [rng.randrange(num_pages) for _ in range(num_references)]
+
+    def build_list(page_class):
+        return [page_class(f"page{n}", f"Page {n}") for n in page_numbers]
+
+    def build_reference_string():
+        references = ReferenceString()
+        for n in page_numbers:
+            references.append(f"page{n}", f"Page {n}")
+        return references
+
+    results = []
+    for name, build in (("dict", lambda: build_list(DictMemoryPage)), ("slots", lambda: build_list(MemoryPage)),
+                        ("array", build_reference_string)):
+        tracemalloc.start()
+        references = build()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del references
+        results.append((name, size / num_references, peak / num_references))
+    return results
+
+
+'''
+References per second with each way of reporting page faults: printing them (to /dev/null), the silent Reporter,
+and buffered CSV and binary fault logs. Also checks that the page faults are the same in every case.
+'''
+
+
+def benchmark_reporters(num_references=200000, num_frames=64, time_window=1000, mean_page=100):
+    trace = generate_trace(num_references, mean_page=mean_page)
+    with tempfile.TemporaryDirectory() as log_directory:
+        reporters = [
+            ("print", None),
+            ("silent", Reporter()),
+            ("csv log", FaultLogReporter(os.path.join(log_directory, "faults.csv"), "csv")),
+            ("binary log", FaultLogReporter(os.path.join(log_directory, "faults.bin"), "binary")),
+            ("histogram", FaultHistogramReporter(print_summary=False)),
+        ]
+        results = []
+        expected_page_faults = None
+        for name, reporter in reporters:
+            manager = MultiprogrammingMemoryManager(
+                num_programs=0, program_pages=None, num_frames=num_frames, time_window=time_window,
+                clock=ReferenceClock(), reporter=reporter)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                start_time = time.perf_counter()
+                manager.simulate_trace(trace)
+                end_time = time.perf_counter()
+            if isinstance(reporter, FaultLogReporter):
+                reporter.close()
+            if expected_page_faults is None:
+                expected_page_faults = manager.program_page_faults
+            elif manager.program_page_faults != expected_page_faults:
+                raise AssertionError(f"Page faults with the {name} reporter differ: {manager.program_page_faults}, "
+                                     f"expected {expected_page_faults}")
+            results.append((name, num_references / (end_time - start_time)))
+    return results
+
+
+def main():
+    for time_window in (0.0, float('inf')):
+        num_references = compare_victim_selection(time_window=time_window)
+        print(f"Victim selection matches the scan-based version on {num_references} references "
+              f"(time window {time_window})")
+    num_frames = check_prefetch_eviction()
+    print(f"Prefetched pages are evicted like any others ({num_frames} frames)")
+    print()
+
+    print("TLB lookup throughput")
+    print(f"{'TLB size':>12} {'lookups/s':>14}")
+    for tlb_size, lookups_per_second in benchmark_tlb_lookups():
+        print(f"{tlb_size:>12} {lookups_per_second:>14,.0f}")
+
+    print()
+    print("Page fault throughput")
+    print(f"{'table size':>12} {'faults/s':>14}")
+    for table_size, faults_per_second in benchmark_page_faults():
+        print(f"{table_size:>12} {faults_per_second:>14,.0f}")
+
+    print()
+    print("Replacement policies")
+    print(f"{'policy':>12} {'page faults':>14} {'references/s':>14}")
+    for name, page_faults, references_per_second in compare_policies():
+        print(f"{name:>12} {page_faults:>14,} {references_per_second:>14,.0f}")
+
+    print()
+    print("Page fault reporting (page faults match)")
+    print(f"{'reporter':>12} {'references/s':>14}")
+    for name, references_per_second in benchmark_reporters():
+        print(f"{name:>12} {references_per_second:>14,.0f}")
+
+    print()
+    print("Reference string memory")
+    print(f"{'storage':>12} {'bytes/ref':>14} {'peak bytes/ref':>16}")
+    for name, bytes_per_reference, peak_per_reference in benchmark_reference_memory():
+        print(f"{name:>12} {bytes_per_reference:>14.1f} {peak_per_reference:>16.1f}")
+
+    results = benchmark_engines()
+    if results:
+        print()
+        print("Simulation engines (page faults match)")
+        print(f"{'engine':>12} {'references/s':>14} {'fault rate':>12}")
+        for engine, references_per_second, fault_rate in results:
+            print(f"{engine:>12} {references_per_second:>14,.0f} {fault_rate:>12.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import heapq
+from collections import OrderedDict
+from itertools import count
+
+from paging_working_sets import PageFrame, ReplacementPolicy
+
+'''
+Replacement policies for WorkingSetPageReplacementAlgorithm and MultiprogrammingMemoryManager, next to the
+working set policy in paging_working_sets. Each one keeps its own bookkeeping up to date from the `loaded` and
+`referenced` hooks, so picking a victim never scans the frames:
+
+- LRUPolicy: evicts the least recently used frame. O(1).
+- ClockPolicy: second chance. Sweeps a hand over reference bits, O(1) amortized.
+- ARCPolicy: Adaptive Replacement Cache (Megiddo and Modha). Balances recency and frequency using ghost lists of
+  recently evicted pages. O(1).
+- OPTPolicy: Belady's optimal policy. Evicts the page whose next use is furthest in the future. It needs the
+  whole reference string in advance, and uses a precomputed next-use index and a heap, O(log n).
+'''
+
+
+class LRUPolicy(ReplacementPolicy):
+    def __init__(self):
+        # Frames from least to most recently used
+        self.recency = OrderedDict()
+
+    def loaded(self, physical_frame, virtual_page):
+        self.recency[physical_frame] = None
+        self.recency.move_to_end(physical_frame)
+
+    referenced = loaded
+
+    def removed(self, physical_frame, virtual_page):
+        self.recency.pop(physical_frame, None)
+
+    def select_victim(self, virtual_page):
+        return next(iter(self.recency))
+
+
+class ClockPolicy(ReplacementPolicy):
+    def __init__(self):
+        self.reference_bits = []
+        self.hand = 0
+
+    def attach(self, page_frame: PageFrame):
+        if len(self.reference_bits) != len(page_frame.frames):
+            self.reference_bits = [False] * len(page_frame.frames)
+            self.hand = 0
+        super().attach(page_frame)
+
+    def loaded(self, physical_frame, virtual_page):
+        self.reference_bits[physical_frame] = True
+
+    referenced = loaded
+
+    def removed(self, physical_frame, virtual_page):
+        self.reference_bits[physical_frame] = False
+
+    def select_victim(self, virtual_page):
+        reference_bits = self.reference_bits
+        # Give every referenced frame a second chance. At most one full turn is needed before a clear bit is found.
+        while reference_bits[self.hand]:
+            reference_bits[self.hand] = False
+            self.hand = (self.hand + 1) % len(reference_bits)
+        victim = self.hand
+        self.hand = (self.hand + 1) % len(reference_bits)
+        return victim
+
+
+class ARCPolicy(ReplacementPolicy):
+    def __init__(self):
+        # Resident pages seen once recently (t1) and at least twice (t2), {virtual_page: frame}, LRU first
+        self.t1 = OrderedDict()
+        self.t2 = OrderedDict()
+        # Ghost lists: pages recently evicted from t1 and t2, {virtual_page: None}, LRU first
+        self.b1 = OrderedDict()
+        self.b2 = OrderedDict()
+        # Target size of t1
+        self.target = 0
+        self.capacity = 0
+
+    def attach(self, page_frame: PageFrame):
+        self.capacity = len(page_frame.frames)
+        super().attach(page_frame)
+
+    def referenced(self, physical_frame, virtual_page):
+        if virtual_page in self.t1:
+            del self.t1[virtual_page]
+            self.t2[virtual_page] = physical_frame
+        elif virtual_page in self.t2:
+            self.t2.move_to_end(virtual_page)
+
+    def loaded(self, physical_frame, virtual_page):
+        # Pages remembered in a ghost list have been used before, so they go straight to t2
+        if virtual_page in self.b1:
+            del self.b1[virtual_page]
+            self.t2[virtual_page] = physical_frame
+        elif virtual_page in self.b2:
+            del self.b2[virtual_page]
+            self.t2[virtual_page] = physical_frame
+        else:
+            self.t1[virtual_page] = physical_frame
+
+    def removed(self, physical_frame, virtual_page):
+        self.t1.pop(virtual_page, None)
+        self.t2.pop(virtual_page, None)
+
+    def select_victim(self, virtual_page):
+        capacity = self.capacity
+        if virtual_page in self.b1:
+            # Recency is winning: give t1 more room
+            self.target = min(capacity, self.target + max(len(self.b2) / len(self.b1), 1))
+            return self._replace(virtual_page)
+        if virtual_page in self.b2:
+            # Frequency is winning: give t2 more room
+            self.target = max(0, self.target - max(len(self.b1) / len(self.b2), 1))
+            return self._replace(virtual_page)
+
+        # A page not seen recently. Trim the ghost lists so the directory stays within twice the capacity.
+        if len(self.t1) + len(self.b1) >= capacity:
+            if len(self.t1) < capacity:
+                self.b1.popitem(last=False)
+                return self._replace(virtual_page)
+            # t1 fills the whole cache: evict its LRU page without remembering it
+            _, victim = self.t1.popitem(last=False)
+            return victim
+        if len(self.t1) + len(self.t2) + len(self.b1) + len(self.b2) >= 2 * capacity:
+            self.b2.popitem(last=False)
+        return self._replace(virtual_page)
+
+    # Evict the LRU page of t1 or t2, depending on the target size of t1, and remember it in the matching ghost list
+    def _replace(self, virtual_page):
+        if self.t1 and (len(self.t1) > self.target or (virtual_page in self.b2 and len(self.t1) == self.target)
+                        or not self.t2):
+            evicted_page, victim = self.t1.popitem(last=False)
+            self.b1[evicted_page] = None
+        else:
+            evicted_page, victim = self.t2.popitem(last=False)
+            self.b2[evicted_page] = None
+        return victim
+
+
+'''
+Belady's OPT. `references` is the full reference string: the virtual page of every reference, in the order the
+algorithm will see them (for MultiprogrammingMemoryManager.simulate_trace, the (program_id, virtual_page) records).
+Every reference reaches the policy through exactly one of `loaded` or `referenced`, so a counter tracks the
+position in the string.
+'''
+
+
+class OPTPolicy(ReplacementPolicy):
+    def __init__(self, references):
+        # next_use[i] is the position of the next reference to the same page after position i
+        never = float("inf")
+        last_seen = {}
+        references = list(references)
+        self.next_use = [never] * len(references)
+        for position in range(len(references) - 1, -1, -1):
+            page = references[position]
+            self.next_use[position] = last_seen.get(page, never)
+            last_seen[page] = position
+        self.position = 0
+        # Max-heap (by negated next use) of (-next_use, frame, sequence), invalidated lazily like WorkingSetPolicy
+        self.heap = []
+        self.sequence = count()
+        self.latest = []
+
+    def attach(self, page_frame: PageFrame):
+        if len(self.latest) != len(page_frame.frames):
+            self.latest = [None] * len(page_frame.frames)
+        super().attach(page_frame)
+
+    def loaded(self, physical_frame, virtual_page):
+        if self.position >= len(self.next_use):
+            raise IndexError("OPTPolicy was given fewer references than were simulated")
+        sequence = self.latest[physical_frame] = next(self.sequence)
+        heapq.heappush(self.heap, (-self.next_use[self.position], physical_frame, sequence))
+        self.position += 1
+        if len(self.heap) > 2 * len(self.latest) + 64:
+            self.heap = [entry for entry in self.heap if self.latest[entry[1]] == entry[2]]
+            heapq.heapify(self.heap)
+
+    referenced = loaded
+
+    def removed(self, physical_frame, virtual_page):
+        self.latest[physical_frame] = None
+
+    def select_victim(self, virtual_page):
+        heap = self.heap
+        latest = self.latest
+        while heap:
+            _, frame_index, sequence = heap[0]
+            if latest[frame_index] == sequence:
+                return frame_index
+            heapq.heappop(heap)
+        return None
@@ -0,0 +1,146 @@
+import csv
+import struct
+from typing import Iterator, Tuple
+
+from paging_working_sets import Reporter
+
+'''
+Reporters for long simulations, next to Reporter and PrintReporter in paging_working_sets:
+
+- FaultLogReporter: writes every page fault to a file, in batches, as CSV or as fixed-size binary records.
+- FaultHistogramReporter: keeps a histogram of the distance, in references, between consecutive page faults of
+  each program and prints it as a summary at the end of the simulation.
+- TeeReporter: passes every event to several reporters, e.g. a log and a histogram.
+
+None of them prints per fault, so they are as cheap as the silent Reporter apart from the work they do themselves.
+'''
+
+# Binary fault log record: time (float64), program (int32, -1 if unknown), virtual page (uint64), frame (uint32)
+# and whether a page was evicted (bool), little-endian with no header
+FAULT_RECORD = struct.Struct("<diQI?")
+FAULT_LOG_FIELDS = ("time", "program", "virtual_page", "physical_frame", "evicted")
+
+
+class FaultLogReporter(Reporter):
+    # Binary logs need integer virtual pages, as in MultiprogrammingMemoryManager; CSV logs take anything
+    def __init__(self, path, log_format="csv", buffer_size=1 << 14):
+        if log_format not in ("csv", "binary"):
+            raise ValueError(f"Unknown fault log format: {log_format!r}")
+        self.log_format = log_format
+        self.buffer_size = buffer_size
+        self.buffer = []  # events not written yet
+        self.page_faults = 0
+        if log_format == "csv":
+            self.log_file = open(path, "w", newline="")
+            self.writer = csv.writer(self.log_file)
+            self.writer.writerow(FAULT_LOG_FIELDS)
+        else:
+            self.log_file = open(path, "wb")
+
+    def page_fault(self, time, program, virtual_page, content, physical_frame, evicted):
+        self.buffer.append((time, -1 if program is None else program, virtual_page, physical_frame, evicted))
+        self.page_faults += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.write_buffer()
+
+    def write_buffer(self):
+        if self.log_format == "csv":
+            self.writer.writerows((time, program, virtual_page, physical_frame, int(evicted))
+                                  for time, program, virtual_page, physical_frame, evicted in self.buffer)
+        else:
+            self.log_file.write(b"".join(FAULT_RECORD.pack(*event) for event in self.buffer))
+        self.buffer.clear()
+
+    # Flushing or closing a log that is already closed does nothing
+    def flush(self):
+        if self.log_file.closed:
+            return
+        self.write_buffer()
+        self.log_file.flush()
+
+    def close(self):
+        if not self.log_file.closed:
+            self.flush()
+            self.log_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Read the events of a binary fault log as (time, program, virtual_page, physical_frame, evicted) tuples
+def read_binary_fault_log(path, chunk_size=1 << 16) -> Iterator[Tuple[float, int, int, int, bool]]:
+    with open(path, "rb") as log_file:
+        while True:
+            chunk = log_file.read(chunk_size * FAULT_RECORD.size)
+            if not chunk:
+                return
+            if len(chunk) % FAULT_RECORD.size:
+                raise ValueError(f"{path}: truncated record at the end of the fault log")
+            yield from FAULT_RECORD.iter_unpack(chunk)
+
+
+'''
+Histogram of the number of references between consecutive page faults of the same program, in power-of-two
+buckets: bucket b counts the distances d with 2^(b-1) <= d < 2^b, and bucket 0 the first fault of each program.
+Distances are measured on the simulation clock, which has to count references, e.g. a ReferenceClock. On the
+default wall clock almost every fault would be less than a second after the last one and land in bucket 0, so fault
+times that are not integers are rejected with ValueError.
+'''
+
+
+class FaultHistogramReporter(Reporter):
+    def __init__(self, print_summary=True):
+        self.print_summary = print_summary
+        self.buckets = []  # {bucket: page faults}
+        self.last_fault_time = {}  # {program: time of its last page fault}
+
+    def page_fault(self, time, program, virtual_page, content, physical_frame, evicted):
+        if not isinstance(time, int):
+            raise ValueError(f"FaultHistogramReporter needs a clock that counts references, such as ReferenceClock, "
+                             f"got the fault time {time!r}")
+        last_time = self.last_fault_time.get(program)
+        bucket = 0 if last_time is None else (time - last_time).bit_length()
+        self.last_fault_time[program] = time
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+        self.buckets[bucket] += 1
+
+    # (low, high, page faults) for every bucket, where the bucket holds distances low <= d < high
+    def histogram(self):
+        return [(0 if bucket == 0 else 1 << (bucket - 1), 1 << bucket, page_faults)
+                for bucket, page_faults in enumerate(self.buckets)]
+
+    def flush(self):
+        if self.print_summary:
+            self.print_histogram()
+
+    def print_histogram(self):
+        total_page_faults = sum(self.buckets)
+        print(f"{'references between faults':>26} {'faults':>10} {'share':>7}")
+        for low, high, page_faults in self.histogram():
+            label = "first fault" if high == 1 else f"{low}-{high - 1}"
+            print(f"{label:>26} {page_faults:>10} {page_faults / total_page_faults:>7.1%}")
+
+
+class TeeReporter(Reporter):
+    def __init__(self, *reporters):
+        self.reporters = reporters
+
+    def page_fault(self, time, program, virtual_page, content, physical_frame, evicted):
+        for reporter in self.reporters:
+            reporter.page_fault(time, program, virtual_page, content, physical_frame, evicted)
+
+    def program_total(self, program, page_faults):
+        for reporter in self.reporters:
+            reporter.program_total(program, page_faults)
+
+    def total(self, page_faults):
+        for reporter in self.reporters:
+            reporter.total(page_faults)
+
+    def flush(self):
+        for reporter in self.reporters:
+            reporter.flush()
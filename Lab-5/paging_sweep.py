@@ -0,0 +1,142 @@
+import argparse
+import contextlib
+import csv
+import itertools
+import multiprocessing
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from paging_traces import read_trace
+from paging_working_sets import MultiprogrammingMemoryManager, ReferenceClock, Reporter
+
+'''
+Parameter sweep for the working set simulator. A trace is parsed once into compact arrays and every combination
+of frame count, TLB size and time window is replayed on it in a pool of worker processes. Time windows are in
+references (the simulations use a ReferenceClock), so the results are deterministic.
+
+Workers are forked after the trace is loaded and read it from this module's globals, so the parsed trace is shared
+copy-on-write instead of being pickled for every run. Where fork is not available each worker receives one copy
+of the trace when it starts.
+
+The time window does not change the results. The working set policy always evicts the least recently referenced
+page: it is the oldest page outside the window whenever any page is, and the fallback when none is. Each frame
+count and TLB size is therefore simulated once, with the first time window, and its row is repeated for every
+other time window in the grid. The `simulated` column is true for the row that was simulated and false for the
+copies.
+'''
+
+# The trace being swept as (program_ids, virtual_pages) arrays, shared read-only with the workers
+shared_trace = None
+
+
+def load_trace(path, trace_format=None):
+    program_ids = array("I")
+    virtual_pages = array("Q")
+    for program_id, virtual_page in read_trace(path, trace_format):
+        program_ids.append(program_id)
+        virtual_pages.append(virtual_page)
+    return program_ids, virtual_pages
+
+
+def _set_shared_trace(trace):
+    global shared_trace
+    shared_trace = trace
+
+
+def run_configuration(num_frames, tlb_size, time_window, engine="object"):
+    program_ids, virtual_pages = shared_trace
+    if engine == "numpy":
+        import numpy as np
+        from paging_vectorized import VectorizedWorkingSetSimulator
+
+        simulator = VectorizedWorkingSetSimulator(num_frames, time_window, tlb_size)
+        simulator.simulate_chunk(np.frombuffer(program_ids, dtype=np.uint32).astype(np.int64),
+                                 np.frombuffer(virtual_pages, dtype=np.uint64))
+        program_page_faults = simulator.program_page_faults
+        tlb_hits, tlb_misses = simulator.tlb_hits, simulator.tlb_misses
+    else:
+        manager = MultiprogrammingMemoryManager(
+            num_programs=0,
+            program_pages=None,
+            num_frames=num_frames,
+            time_window=time_window,
+            clock=ReferenceClock(),
+            tlb_size=tlb_size,
+            reporter=Reporter()
+        )
+        manager.simulate_trace(zip(program_ids, virtual_pages))
+        program_page_faults = manager.program_page_faults
+        tlb_hits, tlb_misses = manager.tlb_cache.hits, manager.tlb_cache.misses
+
+    page_faults = sum(program_page_faults)
+    return {
+        "frames": num_frames,
+        "tlb_size": num_frames if tlb_size is None else tlb_size,
+        "time_window": time_window,
+        "references": len(program_ids),
+        "page_faults": page_faults,
+        "fault_rate": page_faults / len(program_ids) if len(program_ids) else 0.0,
+        "tlb_hit_ratio": tlb_hits / (tlb_hits + tlb_misses) if tlb_hits + tlb_misses else 0.0,
+    }
+
+
+'''
+Replay `trace` (a path, or (program_ids, virtual_pages) arrays from load_trace) for every combination of the
+given frame counts, TLB sizes and time windows. A TLB size of None means one entry per frame. Returns one row
+(a dict) per configuration, in grid order. Configurations that differ only in the time window give the same
+results (see above), so each is simulated once and copied, and the copies have `simulated` set to false. At least
+one time window is needed.
+'''
+
+
+def sweep(trace, frame_counts, time_windows, tlb_sizes=(None,), max_workers=None, trace_format=None,
+          engine="object"):
+    if not time_windows:
+        raise ValueError("at least one time window is needed")
+    if isinstance(trace, (str, os.PathLike)):
+        trace = load_trace(trace, trace_format)
+    # One simulation per frame count and TLB size, run with the first time window
+    simulations = list(itertools.product(frame_counts, tlb_sizes))
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        # Forked workers inherit the trace from the parent
+        _set_shared_trace(trace)
+        executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("fork"))
+    else:
+        executor = ProcessPoolExecutor(max_workers, initializer=_set_shared_trace, initargs=(trace,))
+
+    with executor:
+        futures = [executor.submit(run_configuration, num_frames, tlb_size, time_windows[0], engine)
+                   for num_frames, tlb_size in simulations]
+        results = [future.result() for future in futures]
+    return [dict(row, time_window=time_window, simulated=index == 0)
+            for row in results for index, time_window in enumerate(time_windows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep frame counts, TLB sizes and time windows over a trace.")
+    parser.add_argument("trace", help="trace file of (program_id, virtual_page) records")
+    parser.add_argument("--format", choices=("text", "binary"), help="trace format (default: from the file name)")
+    parser.add_argument("--frames", type=int, nargs="+", required=True, help="frame counts to try")
+    parser.add_argument("--windows", type=int, nargs="+", required=True,
+                        help="time windows in references (they do not change the results, since the working "
+                             "set policy always evicts the least recently referenced page)")
+    parser.add_argument("--tlb-sizes", type=int, nargs="+", help="TLB sizes to try (default: one entry per frame)")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--engine", choices=("object", "numpy"), default="object", help="simulation engine")
+    parser.add_argument("--output", help="write the table as CSV to this file instead of stdout")
+    args = parser.parse_args()
+
+    rows = sweep(args.trace, args.frames, args.windows, args.tlb_sizes or (None,), args.workers, args.format,
+                 args.engine)
+
+    with open(args.output, "w", newline="") if args.output else contextlib.nullcontext(sys.stdout) as output:
+        writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
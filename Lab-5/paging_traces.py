@@ -0,0 +1,127 @@
+import argparse
+import struct
+from typing import Iterable, Iterator, Tuple
+
+from paging_reports import FaultHistogramReporter, FaultLogReporter, TeeReporter
+from paging_working_sets import MultiprogrammingMemoryManager, ReferenceClock, Reporter
+
+'''
+Address traces for the paging simulator. A trace is a sequence of (program_id, virtual_page) records, both
+non-negative integers, stored either as text or in a compact binary format:
+
+- text: one record per line, "program_id virtual_page" separated by whitespace. Blank lines and lines starting
+  with '#' are ignored.
+- binary: fixed-size little-endian records of an unsigned 32-bit program id followed by an unsigned 64-bit
+  virtual page number (12 bytes per record), with no header.
+
+The readers are generators that parse the file a chunk at a time, so a trace of any size can be replayed with
+MultiprogrammingMemoryManager.simulate_trace without loading it into memory.
+'''
+
+BINARY_RECORD = struct.Struct("<IQ")
+DEFAULT_CHUNK_SIZE = 1 << 16  # records per chunk
+
+
+def read_text_trace(path, chunk_size=DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[int, int]]:
+    with open(path, "r") as trace_file:
+        line_number = 0
+        while True:
+            # readlines with a size hint reads roughly chunk_size records worth of lines at a time
+            lines = trace_file.readlines(chunk_size * 16)
+            if not lines:
+                return
+            for line in lines:
+                line_number += 1
+                fields = line.split()
+                if not fields or fields[0].startswith("#"):
+                    continue
+                if len(fields) != 2:
+                    raise ValueError(f"{path}:{line_number}: expected 'program_id virtual_page', got {line.strip()!r}")
+                program_id, virtual_page = int(fields[0]), int(fields[1])
+                if program_id < 0 or virtual_page < 0:
+                    raise ValueError(f"{path}:{line_number}: program ids and virtual pages must be non-negative")
+                yield program_id, virtual_page
+
+
+def read_binary_trace(path, chunk_size=DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[int, int]]:
+    with open(path, "rb") as trace_file:
+        while True:
+            chunk = trace_file.read(chunk_size * BINARY_RECORD.size)
+            if not chunk:
+                return
+            if len(chunk) % BINARY_RECORD.size:
+                raise ValueError(f"{path}: truncated record at the end of the trace")
+            yield from BINARY_RECORD.iter_unpack(chunk)
+
+
+def write_text_trace(path, records: Iterable[Tuple[int, int]]):
+    with open(path, "w") as trace_file:
+        for program_id, virtual_page in records:
+            trace_file.write(f"{program_id} {virtual_page}\n")
+
+
+def write_binary_trace(path, records: Iterable[Tuple[int, int]], chunk_size=DEFAULT_CHUNK_SIZE):
+    with open(path, "wb") as trace_file:
+        chunk = bytearray()
+        for program_id, virtual_page in records:
+            chunk += BINARY_RECORD.pack(program_id, virtual_page)
+            if len(chunk) >= chunk_size * BINARY_RECORD.size:
+                trace_file.write(chunk)
+                chunk.clear()
+        trace_file.write(chunk)
+
+
+# Pick the reader from `trace_format` ("text" or "binary"). Without one, files ending in .bin are read as binary.
+def read_trace(path, trace_format=None, chunk_size=DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[int, int]]:
+    if trace_format is None:
+        trace_format = "binary" if str(path).endswith(".bin") else "text"
+    if trace_format == "text":
+        return read_text_trace(path, chunk_size)
+    if trace_format == "binary":
+        return read_binary_trace(path, chunk_size)
+    raise ValueError(f"Unknown trace format: {trace_format!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an address trace through the working set simulator.")
+    parser.add_argument("trace", help="trace file of (program_id, virtual_page) records")
+    parser.add_argument("--format", choices=("text", "binary"), help="trace format (default: from the file name)")
+    parser.add_argument("--frames", type=int, default=64, help="number of physical frames")
+    parser.add_argument("--window", type=int, default=1000, help="working set window in references")
+    parser.add_argument("--quiet", action="store_true", help="do not print every page fault")
+    parser.add_argument("--fault-log", help="write every page fault to this file (implies --quiet)")
+    parser.add_argument("--fault-log-format", choices=("csv", "binary"), default="csv", help="fault log format")
+    parser.add_argument("--histogram", action="store_true",
+                        help="print a histogram of the references between page faults (implies --quiet)")
+    parser.add_argument("--metrics", help="write the simulation metrics to this file as JSON")
+    parser.add_argument("--sample-interval", type=int, help="sample fault rates and working sets every N references")
+    args = parser.parse_args()
+
+    reporters = []
+    fault_log = FaultLogReporter(args.fault_log, args.fault_log_format) if args.fault_log else None
+    if fault_log is not None:
+        reporters.append(fault_log)
+    if args.histogram:
+        reporters.append(FaultHistogramReporter())
+    reporter = TeeReporter(*reporters) if reporters else Reporter() if args.quiet else None
+
+    manager = MultiprogrammingMemoryManager(
+        num_programs=0,
+        program_pages=None,
+        num_frames=args.frames,
+        time_window=args.window,
+        clock=ReferenceClock(),
+        sample_interval=args.sample_interval,
+        reporter=reporter,
+        metrics_path=args.metrics
+    )
+    try:
+        manager.simulate_trace(read_trace(args.trace, args.format))
+    finally:
+        if fault_log is not None:
+            fault_log.close()
+    manager.print_program_report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+from itertools import islice
+
+import numpy as np
+
+'''
+Array-backed engine for the working set simulator. It replays the same (program_id, virtual_page) traces as
+MultiprogrammingMemoryManager.simulate_trace with a ReferenceClock and produces the same page faults, but keeps its
+state in NumPy arrays:
+
+- pages are interned to integer ids, and the page table and the TLB are arrays indexed by page id,
+- frames and TLB slots hold the time they were last referenced, so the least recently used one is an argmin.
+
+Within a chunk of references, every reference whose page is in the TLB is a hit that only moves timestamps forward.
+Runs of such hits are found and applied with array operations, and the engine only drops to one-reference-at-a-time
+processing for the misses. The speedup comes from the hits: a page fault that evicts a page still finds its victim
+with an argmin over all the frames, which is O(frames) per fault where the object engine's age heap is O(log frames).
+On traces with many faults and many frames it can be slower than the object engine (e.g. 8192 frames at a 95%
+fault rate).
+'''
+
+NOT_PRESENT = -1
+PAGE_BITS = 40  # virtual page bits packed into one interning key with the program id
+NEVER = np.iinfo(np.int64).max  # timestamp of a frame or TLB slot that has never been used
+TRACE_DTYPE = np.dtype([("program_id", "<u4"), ("virtual_page", "<u8")])  # matches paging_traces.BINARY_RECORD
+
+
+class VectorizedWorkingSetSimulator:
+    def __init__(self, num_frames: int, time_window: int, tlb_size=None, min_block_size=64, max_block_size=1 << 14):
+        self.num_frames = num_frames
+        # Victims are always the least recently referenced frame (see WorkingSetPolicy.select_victim),
+        # so the window does not change which page is evicted
+        self.time_window = time_window
+        self.tlb_size = num_frames if tlb_size is None else tlb_size
+        self.min_block_size = min_block_size
+        self.max_block_size = max_block_size
+        self.block_size = min_block_size
+
+        # Reference clock: the time of the last simulated reference
+        self.time = 0
+
+        # Page ids, assigned in order of first reference
+        self.page_ids = {}
+        # Page table {page id: frame} and its reverse index {frame: page id}
+        self.table_frame = np.zeros(0, dtype=np.int64)
+        self.frame_page = np.full(num_frames, NOT_PRESENT, dtype=np.int64)
+
+        # Physical frames
+        self.frame_time = np.full(num_frames, NEVER, dtype=np.int64)
+        self.next_free_frame = 0
+
+        # TLB slots and the slot holding each page
+        self.tlb_slot = np.zeros(0, dtype=np.int64)
+        self.tlb_page = np.full(self.tlb_size, NOT_PRESENT, dtype=np.int64)
+        self.tlb_frame = np.full(self.tlb_size, NOT_PRESENT, dtype=np.int64)
+        self.tlb_stamp = np.full(self.tlb_size, NEVER, dtype=np.int64)
+        self.tlb_used = 0
+        self.tlb_free_slots = []
+
+        self.tlb_hits = 0
+        self.tlb_misses = 0
+        self.tlb_evictions = 0
+        self.tlb_invalidations = 0
+        self.program_page_faults = []
+        self.references = 0
+
+    def _intern(self, program_ids, virtual_pages):
+        # Map each (program_id, virtual_page) pair of the chunk to a page id, adding new pages as needed
+        virtual_pages = virtual_pages.astype(np.uint64)
+        if int(virtual_pages.max()) >> PAGE_BITS == 0 and int(program_ids.max()) >> (63 - PAGE_BITS) == 0:
+            # Sorting one packed key is much cheaper than sorting the pairs
+            keys = (program_ids.astype(np.uint64) << np.uint64(PAGE_BITS)) | virtual_pages
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            unique_pairs = zip((unique_keys >> np.uint64(PAGE_BITS)).tolist(),
+                               (unique_keys & np.uint64((1 << PAGE_BITS) - 1)).tolist())
+        else:
+            pairs = np.stack((program_ids.astype(np.uint64), virtual_pages), axis=1)
+            unique_keys, inverse = np.unique(pairs, axis=0, return_inverse=True)
+            unique_pairs = unique_keys.tolist()
+        unique_ids = np.empty(len(unique_keys), dtype=np.int64)
+        page_ids = self.page_ids
+        num_pages = len(page_ids)
+        for i, (program_id, virtual_page) in enumerate(unique_pairs):
+            page_id = page_ids.get((program_id, virtual_page))
+            if page_id is None:
+                page_id = page_ids[(program_id, virtual_page)] = len(page_ids)
+            unique_ids[i] = page_id
+
+        if len(page_ids) > num_pages:
+            self._grow(len(page_ids))
+        return unique_ids[inverse.reshape(-1)]
+
+    def _grow(self, num_pages):
+        capacity = len(self.table_frame)
+        if num_pages > capacity:
+            capacity = max(num_pages, 2 * capacity)
+            self.table_frame = _resize(self.table_frame, capacity, NOT_PRESENT)
+            self.tlb_slot = _resize(self.tlb_slot, capacity, NOT_PRESENT)
+
+    def _map(self, page_id, frame):
+        self.table_frame[page_id] = frame
+        self.frame_page[frame] = page_id
+
+    # Remove the page held by a frame from the page table and the TLB
+    def _evict(self, frame):
+        page_id = self.frame_page[frame]
+        self.table_frame[page_id] = NOT_PRESENT
+        slot = self.tlb_slot[page_id]
+        if slot != NOT_PRESENT:
+            self.tlb_slot[page_id] = NOT_PRESENT
+            self.tlb_page[slot] = NOT_PRESENT
+            self.tlb_stamp[slot] = NEVER
+            self.tlb_free_slots.append(int(slot))
+            self.tlb_invalidations += 1
+
+    def _tlb_insert(self, page_id, frame, time):
+        if self.tlb_free_slots:
+            slot = self.tlb_free_slots.pop()
+        elif self.tlb_used < self.tlb_size:
+            slot = self.tlb_used
+            self.tlb_used += 1
+        else:
+            # Evict the least recently used entry
+            slot = int(self.tlb_stamp.argmin())
+            evicted_page = self.tlb_page[slot]
+            self.tlb_slot[evicted_page] = NOT_PRESENT
+            self.tlb_evictions += 1
+        self.tlb_page[slot] = page_id
+        self.tlb_frame[slot] = frame
+        self.tlb_stamp[slot] = time
+        self.tlb_slot[page_id] = slot
+
+    # Simulate one reference that misses the TLB. Returns true if it caused a page fault.
+    def _reference(self, page_id, time) -> bool:
+        self.tlb_misses += 1
+        frame = int(self.table_frame[page_id])
+        if frame != NOT_PRESENT:
+            self._tlb_insert(page_id, frame, time)
+            self.frame_time[frame] = time
+            return False
+
+        if self.next_free_frame < self.num_frames:
+            frame = self.next_free_frame
+            self.next_free_frame += 1
+        else:
+            # argmin returns the lowest index on ties, like the (time, frame) order of the age heap in
+            # WorkingSetPolicy.select_victim. It scans every frame, so each evicting fault is O(frames).
+            frame = int(self.frame_time.argmin())
+            self._evict(frame)
+        self.frame_time[frame] = time
+        self._tlb_insert(page_id, frame, time)
+        self._map(page_id, frame)
+        return True
+
+    '''
+    Simulate a chunk of references given as two equal-length arrays. Returns the number of page faults.
+    '''
+
+    def simulate_chunk(self, program_ids, virtual_pages) -> int:
+        program_ids = np.asarray(program_ids)
+        virtual_pages = np.asarray(virtual_pages)
+        if len(program_ids) == 0:
+            return 0
+        page_ids = self._intern(program_ids, virtual_pages)
+        num_programs = int(program_ids.max()) + 1
+        if num_programs > len(self.program_page_faults):
+            self.program_page_faults.extend([0] * (num_programs - len(self.program_page_faults)))
+
+        times = np.arange(self.time + 1, self.time + 1 + len(page_ids), dtype=np.int64)
+        page_faults = 0
+        position = 0
+        while position < len(page_ids):
+            block = page_ids[position:position + self.block_size]
+            block_slots = self.tlb_slot[block]
+            hits = block_slots != NOT_PRESENT
+            num_hits = len(block) if hits.all() else int(hits.argmin())
+
+            if num_hits:
+                # Every reference before the first miss is a TLB hit: move the TLB entries and frames forward in time.
+                # Times increase along the block, so the maximum is the time of the last reference to each.
+                hit_slots = block_slots[:num_hits]
+                hit_times = times[position:position + num_hits]
+                np.maximum.at(self.tlb_stamp, hit_slots, hit_times)
+                np.maximum.at(self.frame_time, self.tlb_frame[hit_slots], hit_times)
+                self.tlb_hits += num_hits
+                position += num_hits
+
+            if num_hits == len(block):
+                self.block_size = min(2 * self.block_size, self.max_block_size)
+                continue
+
+            self.block_size = max(self.min_block_size, self.block_size // 2)
+            if self._reference(int(page_ids[position]), int(times[position])):
+                self.program_page_faults[int(program_ids[position])] += 1
+                page_faults += 1
+            position += 1
+
+        self.time += len(page_ids)
+        self.references += len(page_ids)
+        return page_faults
+
+    '''
+    Replay an iterable of (program_id, virtual_page) records, `chunk_size` records at a time. Returns the total
+    number of page faults; the faults of each program are in `program_page_faults`.
+    '''
+
+    def simulate_trace(self, records, chunk_size=1 << 16) -> int:
+        records = iter(records)
+        total_page_faults = 0
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                return total_page_faults
+            chunk = np.array(chunk, dtype=np.uint64)
+            total_page_faults += self.simulate_chunk(chunk[:, 0].astype(np.int64), chunk[:, 1])
+
+    def simulate_trace_chunks(self, chunks) -> int:
+        total_page_faults = 0
+        for program_ids, virtual_pages in chunks:
+            total_page_faults += self.simulate_chunk(program_ids, virtual_pages)
+        return total_page_faults
+
+
+def _resize(array, capacity, fill_value):
+    resized = np.full(capacity, fill_value, dtype=array.dtype)
+    resized[:len(array)] = array
+    return resized
+
+
+# Read a binary trace (see paging_traces) straight into arrays, yielding (program_ids, virtual_pages) chunks
+def read_binary_trace_chunks(path, chunk_size=1 << 20):
+    with open(path, "rb") as trace_file:
+        while True:
+            chunk = trace_file.read(chunk_size * TRACE_DTYPE.itemsize)
+            if not chunk:
+                return
+            if len(chunk) % TRACE_DTYPE.itemsize:
+                raise ValueError(f"{path}: truncated record at the end of the trace")
+            records = np.frombuffer(chunk, dtype=TRACE_DTYPE)
+            yield records["program_id"].astype(np.int64), records["virtual_page"]
@@ -1,19 +1,202 @@
 from typing import List
-from collections import deque
+from array import array
+from collections import OrderedDict, deque
 from types import SimpleNamespace
+from itertools import count
+import heapq
+import json
+import sys
 import time
 
 
 class MemoryPage:
-    def __init__(self, virtual_address, content):
-        self.content = content
-        self.virtual_address = virtual_address  # The virtual address of the page
-        self.last_referenced_time = time.time()  # Initialize the last referenced time
+    # Slots instead of a per-instance __dict__: traces hold one of these per reference
+    __slots__ = ("content", "virtual_address", "last_referenced_time")
+
+    def __init__(self, virtual_address, content, last_referenced_time=None):
+        # String contents and addresses are interned, so every reference to the same page shares one copy of each
+        self.content = sys.intern(content) if type(content) is str else content
+        # The virtual address of the page
+        self.virtual_address = sys.intern(virtual_address) if type(virtual_address) is str else virtual_address
+        # Initialize the last referenced time. The replacement algorithm resets it from its clock on every reference.
+        self.last_referenced_time = time.time() if last_referenced_time is None else last_referenced_time
+
+
+'''
+A program's reference string stored compactly: one 4-byte page id per reference, plus a single shared
+(virtual_address, content) entry per distinct page. It can be used in place of a List[MemoryPage] anywhere in
+this module. Indexing or iterating yields a MemoryPage whose virtual address is the page id, built on demand.
+'''
+
+
+class ReferenceString:
+    def __init__(self, pages=()):
+        self.page_ids = array("I")
+        self.virtual_addresses = []  # {page id: virtual address}
+        self.contents = []  # {page id: content}
+        self.ids = {}  # {virtual address: page id}
+        for page in pages:
+            self.append(page.virtual_address, page.content)
+
+    def append(self, virtual_address, content):
+        page_id = self.ids.get(virtual_address)
+        if page_id is None:
+            page_id = self.ids[virtual_address] = len(self.virtual_addresses)
+            self.virtual_addresses.append(virtual_address)
+            self.contents.append(content)
+        self.page_ids.append(page_id)
+
+    def __len__(self):
+        return len(self.page_ids)
+
+    # A slice gives a list of pages, like slicing a List[MemoryPage]
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            contents = self.contents
+            return [MemoryPage(page_id, contents[page_id], 0) for page_id in self.page_ids[index]]
+        page_id = self.page_ids[index]
+        return MemoryPage(page_id, self.contents[page_id], 0)
+
+    def __iter__(self):
+        contents = self.contents
+        for page_id in self.page_ids:
+            yield MemoryPage(page_id, contents[page_id], 0)
+
+
+'''
+Clocks used by the replacement algorithm to timestamp references. A clock has `now()`, which returns the current
+time, and `tick()`, which is called once before every reference. `time_window` is measured in the clock's units.
+'''
+
+
+class WallClock:
+    # Real time in seconds. Results depend on how fast the host runs the simulation.
+    def now(self):
+        return time.time()
+
+    def tick(self):
+        pass
+
+
+class ReferenceClock:
+    # Virtual time that advances by one on every reference, so `time_window` is a number of references.
+    # Runs are deterministic and replay as fast as the simulation allows.
+    def __init__(self, start=0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def tick(self):
+        self.time += 1
+
+
+class CallbackClock:
+    # Time supplied by the caller, e.g. the tick counter of an outer simulation
+    def __init__(self, time_function):
+        self.time_function = time_function
+
+    def now(self):
+        return self.time_function()
+
+    def tick(self):
+        pass
+
+
+# Returns a clock for the `clock` argument of the simulator: None means wall time and a plain function is
+# wrapped in a CallbackClock
+def make_clock(clock=None):
+    if clock is None:
+        return WallClock()
+    if callable(clock) and not hasattr(clock, "now"):
+        return CallbackClock(clock)
+    return clock
+
+
+'''
+Latency histogram for one kind of operation. Timing every call would cost about as much as the operations being
+timed, so only one call in every `sample_interval` is timed (see `sample`). Latencies are kept in power-of-two
+nanosecond buckets: bucket b holds latencies below 2^b ns, so percentiles are upper bounds within a factor of two.
+'''
+
+
+class LatencyHistogram:
+    def __init__(self, sample_interval=64):
+        self.sample_interval = sample_interval
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.buckets = []  # {bucket: samples}
+        self.samples = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    # Count a call and return true if it should be timed
+    def sample(self) -> bool:
+        self.calls += 1
+        return self.calls % self.sample_interval == 0
+
+    def record(self, latency_ns):
+        bucket = latency_ns.bit_length()
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+        self.buckets[bucket] += 1
+        self.samples += 1
+        self.total_ns += latency_ns
+        self.max_ns = max(self.max_ns, latency_ns)
+
+    # Upper bound of the latency below which a fraction `q` of the samples fall
+    def percentile(self, q):
+        remaining = q * self.samples
+        for bucket, samples in enumerate(self.buckets):
+            remaining -= samples
+            if remaining <= 0:
+                return 1 << bucket
+        return 0
+
+    def metrics(self):
+        return {
+            "calls": self.calls,
+            "samples": self.samples,
+            "mean_ns": self.total_ns / self.samples if self.samples else 0.0,
+            "p50_ns": self.percentile(0.5),
+            "p99_ns": self.percentile(0.99),
+            "max_ns": self.max_ns,
+            "buckets_ns": {1 << bucket: samples for bucket, samples in enumerate(self.buckets) if samples},
+        }
 
 
 class PageTable:
     def __init__(self):
         self.table = {}  # a dictionary that maps a virtual address to a physical frame {virtual_page: physical_frame}
+        # Reverse index {physical_frame: {virtual_page: None}} so an eviction does not scan the whole table.
+        # The inner dict keeps the pages mapped to a frame in insertion order, which is the order a scan of
+        # `self.table` would find them in.
+        self.frame_index = {}
+        # Time per get_frame, sampled every `sample_interval` lookups
+        self.lookup_latency = LatencyHistogram()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        # Lookups that found the page, lookups that did not, and pages mapped and unmapped
+        self.hits = 0
+        self.misses = 0
+        self.mapped = 0
+        self.unmapped = 0
+        self.lookup_latency.reset()
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.table),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "mapped": self.mapped,
+            "unmapped": self.unmapped,
+            "lookup_latency": dict(self.lookup_latency.metrics(), calls=lookups),
+        }
 
     # Returns true if the page exists in the page table and false otherwise
     def map_page(self, virtual_page, physical_frame) -> bool:
@@ -22,84 +205,365 @@ class PageTable:
             # If it is, return true
             return True
         self.table[virtual_page] = physical_frame
+        self.frame_index.setdefault(physical_frame, {})[virtual_page] = None
+        self.mapped += 1
         return False
 
     def get_frame(self, virtual_page):
-        return self.table.get(virtual_page, None)
+        # Time one lookup in every sample interval
+        if (self.hits + self.misses + 1) % self.lookup_latency.sample_interval:
+            return self._get_frame(virtual_page)
+        start_time = time.perf_counter_ns()
+        physical_frame = self._get_frame(virtual_page)
+        self.lookup_latency.record(time.perf_counter_ns() - start_time)
+        return physical_frame
+
+    def _get_frame(self, virtual_page):
+        physical_frame = self.table.get(virtual_page, None)
+        if physical_frame is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return physical_frame
 
+    # Remove the entry mapping a page to the frame and return that page (None if the frame was not mapped)
     def remove_page_table_entry(self, frame_index):
-        for virtual_page, physical_frame in self.table.items():
-            if physical_frame == frame_index:
-                del self.table[virtual_page]
-                return
+        virtual_pages = self.frame_index.get(frame_index)
+        if not virtual_pages:
+            return None
+        # Remove the first page that was mapped to the frame
+        virtual_page = next(iter(virtual_pages))
+        del virtual_pages[virtual_page]
+        if not virtual_pages:
+            del self.frame_index[frame_index]
+        del self.table[virtual_page]
+        self.unmapped += 1
+        return virtual_page
 
 
 class TLBCache:
     def __init__(self, size):
-        self.cache = {}
+        # An ordered dict keeps the entries from least to most recently used, so lookups,
+        # inserts and evictions are all O(1)
+        self.cache = OrderedDict()
         self.size = size
-        self.queue = deque()
+        # Time per lookup, sampled every `sample_interval` lookups
+        self.lookup_latency = LatencyHistogram()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lookup_latency.reset()
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": self.size,
+            "entries": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "lookup_latency": dict(self.lookup_latency.metrics(), calls=lookups),
+        }
 
     def lookup(self, virtual_page):
-        if virtual_page in self.cache:
+        # Time one lookup in every sample interval
+        if (self.hits + self.misses + 1) % self.lookup_latency.sample_interval:
+            return self._lookup(virtual_page)
+        start_time = time.perf_counter_ns()
+        physical_frame = self._lookup(virtual_page)
+        self.lookup_latency.record(time.perf_counter_ns() - start_time)
+        return physical_frame
+
+    def _lookup(self, virtual_page):
+        physical_frame = self.cache.get(virtual_page)
+        if physical_frame is not None:
             # TLB hit
-            self.queue.remove(virtual_page)
-            self.queue.append(virtual_page)
-            return self.cache[virtual_page]
+            self.cache.move_to_end(virtual_page)
+            self.hits += 1
+            return physical_frame
         else:
             # TLB miss
+            self.misses += 1
             return None
 
     def insert(self, virtual_page, physical_frame):
-        if len(self.cache) >= self.size:
+        if virtual_page in self.cache:
+            self.cache.move_to_end(virtual_page)
+        elif len(self.cache) >= self.size:
             # Remove the least recently used entry
-            removed_page = self.queue.popleft()
-            del self.cache[removed_page]
+            self.cache.popitem(last=False)
+            self.evictions += 1
 
         self.cache[virtual_page] = physical_frame
-        self.queue.append(virtual_page)
+
+    # Drop the entry for a page that is no longer in memory so later lookups cannot hit a frame that holds another page
+    def invalidate(self, virtual_page):
+        if self.cache.pop(virtual_page, None) is not None:
+            self.invalidations += 1
 
 
 class PageFrame:
     def __init__(self, size: int):
         self.frames = [None] * size
+        # Stack of free frame indices. It starts in reverse order so frames are handed out from index 0 up,
+        # the same order a scan for the first empty frame would give.
+        self.free_frames = list(range(size - 1, -1, -1))
+        # The replacement algorithm (i.e. the program) each frame was allocated to
+        self.owners = [None] * size
+
+    def allocate_frame(self, page_content: MemoryPage, owner=None):
+        if not self.free_frames:
+            return -1  # No available frame
+        frame_index = self.free_frames.pop()
+        self.frames[frame_index] = page_content
+        self.owners[frame_index] = owner
+        return frame_index
 
-    def allocate_frame(self, page_content: MemoryPage):
-        for i, frame in enumerate(self.frames):
-            if frame is None:
-                self.frames[i] = page_content
-                return i
-        return -1  # No available frame
+    # Allocate a frame for each page and return the frame indices. Stops early when memory runs out, so fewer
+    # indices than pages may be returned. This only fills frames; to prefetch pages so they can be found and evicted
+    # later, use WorkingSetPageReplacementAlgorithm.prefetch, which also maps them and tells the policy.
+    def allocate_many(self, pages: List[MemoryPage], owner=None) -> List[int]:
+        frame_indices = []
+        for page in pages:
+            if not self.free_frames:
+                break
+            frame_index = self.free_frames.pop()
+            self.frames[frame_index] = page
+            self.owners[frame_index] = owner
+            frame_indices.append(frame_index)
+        return frame_indices
 
     def deallocate_frame(self, frame_index):
-        self.frames[frame_index] = None
+        if self.frames[frame_index] is not None:
+            self.frames[frame_index] = None
+            self.owners[frame_index] = None
+            self.free_frames.append(frame_index)
+
+    # Swap the page held by an allocated frame for a new one without returning the frame to the free pool
+    def replace_frame(self, frame_index, page_content: MemoryPage, owner=None):
+        self.frames[frame_index] = page_content
+        self.owners[frame_index] = owner
+
+
+'''
+Replacement policies decide which frame to evict when memory is full. The replacement algorithm keeps the page
+table, TLB and frames up to date and tells the policy about every reference through exactly one of two hooks:
+`loaded` when a page is brought into a frame, `referenced` when a resident page is used again. `removed` is called
+when a frame is freed without being replaced. Pages are identified by their TLB key, which is unique across
+programs. A policy can be shared by several algorithms that share the same frames, e.g. all the programs of a
+MultiprogrammingMemoryManager. More policies are in paging_policies.
+'''
+
+
+class ReplacementPolicy:
+    # Called by every algorithm that uses the policy, with the frames it manages
+    def attach(self, page_frame: PageFrame):
+        self.page_frame = page_frame
+
+    def loaded(self, physical_frame, virtual_page):
+        pass
+
+    def referenced(self, physical_frame, virtual_page):
+        pass
+
+    def removed(self, physical_frame, virtual_page):
+        pass
+
+    # Returns the frame to evict to make room for `virtual_page`. Only called when every frame is in use.
+    def select_victim(self, virtual_page):
+        raise NotImplementedError
+
+
+class WorkingSetPolicy(ReplacementPolicy):
+    def __init__(self, time_window=None):
+        self.time_window = time_window
+        # Min-heap of (last_referenced_time, frame_index, sequence) used to find the oldest page. Entries are not
+        # removed when a frame is referenced again; only the latest sequence number of each frame is valid and
+        # stale entries are skipped when they reach the top.
+        self.age_heap = []
+        self.sequence = count()
+        self.latest = []
+
+    def attach(self, page_frame: PageFrame):
+        if len(self.latest) != len(page_frame.frames):
+            self.latest = [None] * len(page_frame.frames)
+        super().attach(page_frame)
+
+    def loaded(self, physical_frame, virtual_page):
+        sequence = self.latest[physical_frame] = next(self.sequence)
+        page = self.page_frame.frames[physical_frame]
+        heapq.heappush(self.age_heap, (page.last_referenced_time, physical_frame, sequence))
+        if len(self.age_heap) > 2 * len(self.latest) + 64:
+            self._rebuild_age_heap()
+
+    referenced = loaded
+
+    def removed(self, physical_frame, virtual_page):
+        self.latest[physical_frame] = None
+
+    # The oldest resident page is outside the working set whenever any page is, and it is also the fallback when
+    # none is, so both cases pick the least recently referenced frame (lowest index on ties).
+    def select_victim(self, virtual_page):
+        age_heap = self.age_heap
+        latest = self.latest
+        while age_heap:
+            _, frame_index, sequence = age_heap[0]
+            if latest[frame_index] == sequence:
+                return frame_index
+            heapq.heappop(age_heap)
+        return None
+
+    def _rebuild_age_heap(self):
+        frames = self.page_frame.frames
+        self.age_heap = [(frames[i].last_referenced_time, i, sequence)
+                         for i, sequence in enumerate(self.latest) if sequence is not None and frames[i] is not None]
+        heapq.heapify(self.age_heap)
+
+
+'''
+Reporters receive the page faults and page fault totals of a simulation. They only observe it, so the results are
+the same whichever reporter is used. The base Reporter is silent: the simulation still counts faults (see
+MultiprogrammingMemoryManager.program_page_faults) but nothing is formatted or written. PrintReporter prints every
+event, and is the default. More reporters, e.g. a buffered event log, are in paging_reports.
+
+`program` is the index of the faulting program, or None for an algorithm without an asid. `evicted` is true if the
+fault replaced another page and false if it was loaded into a free frame.
+'''
+
+
+class Reporter:
+    def page_fault(self, time, program, virtual_page, content, physical_frame, evicted):
+        pass
+
+    def program_total(self, program, page_faults):
+        pass
+
+    def total(self, page_faults):
+        pass
+
+    # Called at the end of every simulation
+    def flush(self):
+        pass
+
+
+class PrintReporter(Reporter):
+    def page_fault(self, time, program, virtual_page, content, physical_frame, evicted):
+        # Faults that replace a page are reported by the replacement algorithm, which does not know the program
+        if evicted:
+            print(f"Page fault occurred. Page {content} loaded into frame {physical_frame}.")
+        else:
+            print(f"Program {program + 1} Page fault occurred. Page {content} loaded into frame {physical_frame}.")
+
+    def program_total(self, program, page_faults):
+        print(f"Program {program + 1} Total Page Faults:", page_faults)
+
+    def total(self, page_faults):
+        print("Total Page Faults for all programs:", page_faults)
+
+
+# TLB keys of programs with an address space id are (asid << ASID_SHIFT) | virtual_page, so that one integer
+# identifies a page of a program. Virtual page numbers must fit in ASID_SHIFT bits; other virtual addresses are
+# numbered first (see WorkingSetPageReplacementAlgorithm.page_number).
+ASID_SHIFT = 64
+
+'''
+Page replacement on top of a page table, a TLB and a set of frames. References are timestamped with `clock` (wall
+time by default). The clock is shared with the caller, who ticks it once per reference; MultiprogrammingMemoryManager
+does this for every page it simulates. Which page to evict is up to `policy`, the working set policy by default.
+Page faults that replace a page are passed to `reporter`, a PrintReporter by default.
+
+Each program has its own algorithm and page table. Programs that share a TLB tell their entries apart by `asid`, in
+which case TLB keys are built from integer page numbers. Without an asid, virtual pages are used as TLB keys as they
+are.
+'''
 
 
 class WorkingSetPageReplacementAlgorithm:
-    def __init__(self, page_frame: PageFrame, page_table: PageTable, tlb_cache: TLBCache, time_window: float):
+    def __init__(self, page_frame: PageFrame, page_table: PageTable, tlb_cache: TLBCache, time_window: float,
+                 clock=None, policy: ReplacementPolicy = None, asid=None, reporter: Reporter = None):
         self.page_frame = page_frame
         self.page_table = page_table
         self.tlb_cache = tlb_cache
         self.time_window = time_window
+        self.clock = make_clock(clock)
+        self.policy = WorkingSetPolicy(time_window) if policy is None else policy
+        self.policy.attach(page_frame)
+        self.asid = asid
+        # Page numbers given to the non-integer virtual addresses of this program {virtual_address: virtual_page}
+        self.page_numbers = {}
+        self.reporter = PrintReporter() if reporter is None else reporter
+        # Time spent choosing and evicting a victim on page faults that replace a page
+        self.eviction_latency = LatencyHistogram()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.page_faults = 0
+        self.evictions = 0
+        self.eviction_latency.reset()
+
+    # Counters of this algorithm and its page table. The TLB may be shared, so its metrics are reported separately.
+    def metrics(self):
+        return {
+            "page_faults": self.page_faults,
+            "evictions": self.evictions,
+            "page_table": self.page_table.metrics(),
+            "eviction_latency": self.eviction_latency.metrics(),
+        }
+
+    # Page tables and the TLB are keyed by integer page numbers. Other virtual addresses (e.g. "program1_page1")
+    # are numbered in order of first use.
+    def page_number(self, virtual_address) -> int:
+        virtual_page = self.page_numbers.get(virtual_address)
+        if virtual_page is None:
+            virtual_page = self.page_numbers[virtual_address] = len(self.page_numbers)
+        return virtual_page
+
+    def tlb_key(self, virtual_page):
+        if self.asid is None:
+            return virtual_page
+        if type(virtual_page) is not int:
+            virtual_page = self.page_number(virtual_page)
+        return (self.asid << ASID_SHIFT) | virtual_page
 
-    def try_allocate(self, new_page):
+    # Mark the page held by a frame as referenced now
+    def touch(self, physical_frame, tlb_key):
+        page = self.page_frame.frames[physical_frame]
+        if page is not None:
+            page.last_referenced_time = self.clock.now()
+            self.policy.referenced(physical_frame, tlb_key)
+
+    # `virtual_page` is the key of the page in the page table, new_page.virtual_address unless given
+    def try_allocate(self, new_page, virtual_page=None):
+        if virtual_page is None:
+            virtual_page = new_page.virtual_address
         # Check TLB cache first
-        virtual_page = new_page.virtual_address
-        tlb_hit = self.tlb_cache.lookup(virtual_page)
+        tlb_key = self.tlb_key(virtual_page)
+        tlb_hit = self.tlb_cache.lookup(tlb_key)
         if tlb_hit is not None:
+            self.touch(tlb_hit, tlb_key)
             return tlb_hit
 
         # if the page exists in page table, update the TLB cache
-        if self.page_table.get_frame(virtual_page) is not None:
-            self.tlb_cache.insert(
-                virtual_page, self.page_table.get_frame(virtual_page))
-            return self.page_table.get_frame(virtual_page)
+        physical_frame = self.page_table.get_frame(virtual_page)
+        if physical_frame is not None:
+            self.tlb_cache.insert(tlb_key, physical_frame)
+            self.touch(physical_frame, tlb_key)
+            return physical_frame
 
         # If TLB miss, check if there's an available frame
-        available_frame = self.page_frame.allocate_frame(new_page)
+        new_page.last_referenced_time = self.clock.now()
+        available_frame = self.page_frame.allocate_frame(new_page, self)
 
         if available_frame != -1:
-            self.tlb_cache.insert(virtual_page, available_frame)
+            self.policy.loaded(available_frame, tlb_key)
+            self.tlb_cache.insert(tlb_key, available_frame)
+            self.page_faults += 1
             return available_frame
 
         return -1
@@ -107,108 +571,461 @@ class WorkingSetPageReplacementAlgorithm:
     def map_page(self, virtual_page, physical_frame) -> bool:
         return self.page_table.map_page(virtual_page, physical_frame)
 
-    def replace_page(self, new_page):
+    # Load pages into free frames before they are referenced and map them, without counting page faults. Pages that
+    # are already mapped, or repeated, are skipped. `virtual_pages` are the page table keys of the pages, their
+    # virtual addresses unless given. Stops when memory runs out; returns the frames that were filled.
+    def prefetch(self, pages: List[MemoryPage], virtual_pages=None) -> List[int]:
+        if virtual_pages is None:
+            virtual_pages = [page.virtual_address for page in pages]
+        # {virtual_page: page} of the pages to load, in order
+        missing = {}
+        for page, virtual_page in zip(pages, virtual_pages):
+            if virtual_page not in self.page_table.table and virtual_page not in missing:
+                missing[virtual_page] = page
+        now = self.clock.now()
+        for page in missing.values():
+            page.last_referenced_time = now
+        frame_indices = self.page_frame.allocate_many(list(missing.values()), self)
+        for physical_frame, virtual_page in zip(frame_indices, missing):
+            self.page_table.map_page(virtual_page, physical_frame)
+            self.policy.loaded(physical_frame, self.tlb_key(virtual_page))
+        return frame_indices
+
+    # Returns the index of the frame to evict to make room for the page with TLB key `tlb_key`
+    def select_victim(self, tlb_key):
+        return self.policy.select_victim(tlb_key)
+
+    # Unmap the page held by a frame from the page table and the TLB of the program that owns it
+    def evict_frame(self, physical_frame):
+        owner = self.page_frame.owners[physical_frame] or self
+        evicted_virtual_page = owner.page_table.remove_page_table_entry(physical_frame)
+        if evicted_virtual_page is None:
+            # Allocated but never mapped. tlb_key numbers the address the way the reference that loaded it was.
+            evicted_virtual_page = self.page_frame.frames[physical_frame].virtual_address
+        self.tlb_cache.invalidate(owner.tlb_key(evicted_virtual_page))
+
+    # Free every frame that holds one of this program's pages, e.g. when the program is swapped out.
+    # Returns the number of frames freed.
+    def release_pages(self) -> int:
+        mappings = list(self.page_table.table.items())
+        for virtual_page, physical_frame in mappings:
+            self.page_table.remove_page_table_entry(physical_frame)
+            tlb_key = self.tlb_key(virtual_page)
+            self.tlb_cache.invalidate(tlb_key)
+            self.policy.removed(physical_frame, tlb_key)
+            self.page_frame.deallocate_frame(physical_frame)
+        return len(mappings)
+
+    def replace_page(self, new_page, virtual_page=None):
+        if virtual_page is None:
+            virtual_page = new_page.virtual_address
         # Check TLB cache first
-        virtual_page = new_page.virtual_address
-        tlb_hit = self.tlb_cache.lookup(virtual_page)
+        tlb_key = self.tlb_key(virtual_page)
+        tlb_hit = self.tlb_cache.lookup(tlb_key)
         if tlb_hit is not None:
+            self.touch(tlb_hit, tlb_key)
             return tlb_hit
 
         # TODO: Check if there's an available frame using a function implemented above (one line of code)
-        available_frame = self.try_allocate(new_page)
+        available_frame = self.try_allocate(new_page, virtual_page)
 
         if available_frame != -1:
             return available_frame
 
-        # If there's no available frame, replace the pages outside the working set
-        # TODO: get current time using `time` package
-        current_time = time.time()
-        # Get the indecies of the frames outside the working set
-        # TODO: you can do that with a loop that checks whether the last_referenced_time of the frame is within `self.time_window`
-        working_set = []
-        for i, frame in enumerate(self.page_frame.frames):
-            if frame is not None and (current_time - frame.last_referenced_time) > self.time_window:
-                    working_set.append(i)
-               
-        if not working_set:
-            # TODO: If the working set is empty, get the index of the oldest page from page_frame.frames
-            # Hint: you can get the oldest frame using a loop that checks the last_referenced_time of each frame
-            oldest_frame_time = float('inf')
-            frame_to_replace = None
-            for i, frame in enumerate(self.page_frame.frames):
-                if frame is not None and frame.last_referenced_time < oldest_frame_time:
-                    oldest_frame_time = frame.last_referenced_time
-                    frame_to_replace = i
-        else:
-            # TODO: Replace the oldest page outside the working set
-            # Hint: it is similar to what you wrote at line 129 but you need to get the oldest page from the working_set
-            frame_to_replace = None
-            oldest_frame_time = float('inf')
-            for frame in working_set:
-                if self.page_frame.frames[frame].last_referenced_time < oldest_frame_time:
-                    oldest_frame_time = self.page_frame.frames[frame].last_referenced_time
-                    frame_to_replace = frame
-            
+        return self.replace_victim(new_page, virtual_page)
+
+    # Load a page that is not in memory into a victim's frame, for when try_allocate found no free frame. Unlike
+    # replace_page it does not look the page up again, so each reference counts one TLB and page table lookup.
+    def replace_victim(self, new_page, virtual_page=None):
+        if virtual_page is None:
+            virtual_page = new_page.virtual_address
+        tlb_key = self.tlb_key(virtual_page)
+        timed = self.eviction_latency.sample()
+        if timed:
+            start_time = time.perf_counter_ns()
+
+        # If there's no available frame, let the policy pick the page to replace
+        frame_to_replace = self.select_victim(tlb_key)
 
         # TODO: Remove page table entry.
-        self.page_table.remove_page_table_entry(frame_to_replace)
+        self.evict_frame(frame_to_replace)
+        if timed:
+            self.eviction_latency.record(time.perf_counter_ns() - start_time)
+        self.page_faults += 1
+        self.evictions += 1
 
         # TODO: Deallocate the old page and allocate the new page in its place
-        self.page_frame.deallocate_frame(frame_to_replace)
-        self.page_frame.frames[frame_to_replace] = new_page
+        new_page.last_referenced_time = self.clock.now()
+        self.page_frame.replace_frame(frame_to_replace, new_page, self)
+        self.policy.loaded(frame_to_replace, tlb_key)
 
         # TODO: Update TLB cache with the new mapping
-        self.tlb_cache.insert(virtual_page, frame_to_replace)
+        self.tlb_cache.insert(tlb_key, frame_to_replace)
 
-        # Print a message for the page fault
-        print(
-            f"Page fault occurred. Page {new_page.content} loaded into frame {frame_to_replace}.")
+        # Report the page fault
+        self.reporter.page_fault(new_page.last_referenced_time, self.asid, virtual_page, new_page.content,
+                                 frame_to_replace, True)
 
         return frame_to_replace
 
 
+'''
+Estimate of a program's working set: the number of distinct pages it referenced within the last `time_window`
+(in clock units). Each reference costs O(1) amortized.
+'''
+
+
+class WorkingSetEstimator:
+    def __init__(self, time_window):
+        self.time_window = time_window
+        self.references = deque()  # (time, virtual_page), oldest first
+        self.page_counts = {}  # {virtual_page: references within the window}
+
+    def record(self, now, virtual_page):
+        self.references.append((now, virtual_page))
+        self.page_counts[virtual_page] = self.page_counts.get(virtual_page, 0) + 1
+        # Forget references that have left the window
+        references = self.references
+        page_counts = self.page_counts
+        while now - references[0][0] > self.time_window:
+            _, old_page = references.popleft()
+            remaining = page_counts[old_page] - 1
+            if remaining:
+                page_counts[old_page] = remaining
+            else:
+                del page_counts[old_page]
+
+    def size(self) -> int:
+        return len(self.page_counts)
+
+
 class MultiprogrammingMemoryManager:
-    def __init__(self, num_programs: int, program_pages: List[List[MemoryPage]], num_frames: int, time_window: float):
-        self.num_programs = num_programs
+    def __init__(self, num_programs: int, program_pages: List[List[MemoryPage]], num_frames: int, time_window: float,
+                 clock=None, tlb_size=None, policy: ReplacementPolicy = None, sample_interval=None,
+                 reporter: Reporter = None, metrics_path=None):
+        self.num_programs = 0
         self.programs = []
+        self.time_window = time_window
         self.page_frame = PageFrame(num_frames)
-        self.page_table = PageTable()
-        self.tlb_cache = TLBCache(size=num_frames)
+        # One TLB for all programs, tagged by program. It has one entry per frame unless a size is given.
+        self.tlb_cache = TLBCache(size=num_frames if tlb_size is None else tlb_size)
+        # One clock shared by all programs, ticked once per simulated reference
+        self.clock = make_clock(clock)
+        # References and page faults per program from the last simulation
+        self.program_references = []
+        self.program_page_faults = []
+        # Every `sample_interval` references, the fault rate of each program since the previous sample is added to
+        # `fault_rate_history`
+        self.sample_interval = sample_interval
+        self.total_references = 0
+        self.fault_rate_history = []
+        self.last_sample = ([], [])
+        # Working set estimates per program, kept only while a load controller is running
+        self.working_set_estimators = None
+        # (total_references, "suspend" or "resume", program index) decisions of the load controller
+        self.load_control_events = []
+        # One replacement policy for all programs, since they compete for the same frames
+        self.policy = WorkingSetPolicy(time_window) if policy is None else policy
+        # Page faults and totals go to the reporter. Reporter() keeps the simulation silent.
+        self.reporter = PrintReporter() if reporter is None else reporter
+        # Time to simulate one reference, sampled every `sample_interval` references
+        self.reference_latency = LatencyHistogram()
+        # Where to write the metrics (see `metrics`) as JSON at the end of every simulation, if anywhere
+        self.metrics_path = metrics_path
 
+        # program_pages may be None when the references come from a trace (see simulate_trace)
         for i in range(num_programs):
-            working_set_algorithm = WorkingSetPageReplacementAlgorithm(
-                self.page_frame, self.page_table, self.tlb_cache, time_window)
-            self.programs.append((program_pages[i], working_set_algorithm))
+            self.add_program(program_pages[i] if program_pages is not None else [])
+
+    # Add a program with its own page table and replacement algorithm and return its index
+    def add_program(self, program_pages: List[MemoryPage]) -> int:
+        asid = self.num_programs
+        working_set_algorithm = WorkingSetPageReplacementAlgorithm(
+            self.page_frame, PageTable(), self.tlb_cache, self.time_window, self.clock, self.policy, asid,
+            self.reporter)
+        self.programs.append((program_pages, working_set_algorithm))
+        self.program_references.append(0)
+        self.program_page_faults.append(0)
+        self.num_programs += 1
+        return asid
+
+    # Page number of a virtual address of program `i` (see WorkingSetPageReplacementAlgorithm.page_number)
+    def page_number(self, i, virtual_address) -> int:
+        return self.programs[i][1].page_number(virtual_address)
+
+    # Simulate one reference by program `i`. Returns true if it caused a page fault.
+    def simulate_reference(self, i, page) -> bool:
+        working_set_algorithm = self.programs[i][1]
+        self.clock.tick()
+        self.program_references[i] += 1
+        self.total_references += 1
+        # Time one reference in every sample interval
+        timed = self.total_references % self.reference_latency.sample_interval == 0
+        if timed:
+            start_time = time.perf_counter_ns()
+        virtual_page = page.virtual_address
+        if type(virtual_page) is not int:
+            virtual_page = working_set_algorithm.page_number(virtual_page)
+        if self.working_set_estimators is not None:
+            self.working_set_estimators[i].record(self.clock.now(), virtual_page)
+        physical_frame = working_set_algorithm.try_allocate(page, virtual_page)
+
+        if physical_frame != -1:
+            page_status = working_set_algorithm.map_page(
+                virtual_page, physical_frame)
+            page_fault = not page_status
+            if page_fault:
+                self.reporter.page_fault(self.clock.now(), i, virtual_page, page.content, physical_frame, False)
+                self.program_page_faults[i] += 1
+        else:
+            physical_frame = working_set_algorithm.replace_victim(
+                MemoryPage(page.virtual_address, page.content), virtual_page)
+            working_set_algorithm.map_page(
+                virtual_page, physical_frame)
+            self.program_page_faults[i] += 1
+            page_fault = True
+
+        if timed:
+            self.reference_latency.record(time.perf_counter_ns() - start_time)
+        # Sample once the reference is simulated, so the sample includes its page fault and the pages it left resident
+        if self.sample_interval and self.total_references % self.sample_interval == 0:
+            self.record_sample()
+        return page_fault
+
+    def _reset_counters(self):
+        self.program_references = [0] * self.num_programs
+        self.program_page_faults = [0] * self.num_programs
+        self.total_references = 0
+        self.fault_rate_history = []
+        self.last_sample = ([0] * self.num_programs, [0] * self.num_programs)
+        self.load_control_events = []
+        self.reference_latency.reset()
+        self.tlb_cache.reset_metrics()
+        for _, working_set_algorithm in self.programs:
+            working_set_algorithm.reset_metrics()
+            working_set_algorithm.page_table.reset_metrics()
+
+    # Add one row per program to fault_rate_history with its references and faults since the previous sample
+    def record_sample(self):
+        last_references, last_page_faults = self.last_sample
+        for i in range(self.num_programs):
+            previous_references = last_references[i] if i < len(last_references) else 0
+            previous_page_faults = last_page_faults[i] if i < len(last_page_faults) else 0
+            references = self.program_references[i] - previous_references
+            page_faults = self.program_page_faults[i] - previous_page_faults
+            self.fault_rate_history.append({
+                "time": self.total_references,
+                "program": i + 1,
+                "references": references,
+                "page_faults": page_faults,
+                "fault_rate": page_faults / references if references else 0.0,
+                "resident_set_size": self.resident_set_size(i),
+                "working_set_size": self.working_set_size(i),
+            })
+        self.last_sample = (list(self.program_references), list(self.program_page_faults))
+
+    '''
+    Simulate the programs' reference strings. With the "sequential" schedule each program runs to completion before
+    the next one starts. With "round_robin" the programs take turns of `quantum` references each, or
+    `quantum * weights[i]` for program i when weights are given. Turns that are not whole numbers of references
+    are rounded to the nearest one, and are at least one reference long, so fractional quanta and weights are fine.
+
+    With `load_control`, a working set load controller runs after every turn. Working sets are the pages each program
+    referenced within `time_window` on the shared clock. While the working sets of the running programs add up to
+    more than the number of frames, the program with the largest working set is suspended and
+    its frames are freed. Suspended programs resume, first in first out, once their working set fits again.
+    Only applies to round robin scheduling; asking for it with the sequential schedule raises ValueError, as do a
+    quantum or weights that are not positive and, with load control, a negative time window.
+    '''
+
+    def simulate_memory_management(self, schedule="sequential", quantum=1, weights=None, load_control=False):
+        if schedule == "round_robin":
+            return self._simulate_round_robin(quantum, weights, load_control)
+        if schedule != "sequential":
+            raise ValueError(f"Unknown schedule: {schedule!r}")
+        if load_control:
+            raise ValueError("load_control needs the round_robin schedule")
 
-    def simulate_memory_management(self):
         total_page_faults = 0
+        self._reset_counters()
 
         for i in range(self.num_programs):
             program_page_faults = 0
-            program_pages, working_set_algorithm = self.programs[i]
+            program_pages = self.programs[i][0]
 
             for page in program_pages:
-                virtual_page = page.virtual_address
-                physical_frame = working_set_algorithm.try_allocate(page)
-
-                if physical_frame != -1:
-                    page_status = working_set_algorithm.map_page(
-                        virtual_page, physical_frame)
-                    if not page_status:
-                        print(
-                            f"Program {i + 1} Page fault occurred. Page {page.content} loaded into frame {physical_frame}.")
-                        program_page_faults += 1
-                else:
-                    physical_frame = working_set_algorithm.replace_page(
-                        MemoryPage(virtual_page, page.content))
-                    working_set_algorithm.map_page(
-                        virtual_page, physical_frame)
+                if self.simulate_reference(i, page):
                     program_page_faults += 1
 
-            print(f"Program {i + 1} Total Page Faults:", program_page_faults)
+            self.reporter.program_total(i, program_page_faults)
             total_page_faults += program_page_faults
 
-        print("Total Page Faults for all programs:", total_page_faults)
+        self.reporter.total(total_page_faults)
+        self._finish_simulation()
+        return total_page_faults
+
+    def _simulate_round_robin(self, quantum, weights, load_control):
+        if quantum <= 0:
+            raise ValueError(f"quantum must be positive, got {quantum}")
+        if weights is not None and len(weights) != self.num_programs:
+            raise ValueError("weights must have one entry per program")
+        if weights is not None and any(weight <= 0 for weight in weights):
+            raise ValueError("weights must be positive")
+        if load_control and self.time_window < 0:
+            raise ValueError(f"load control needs a time window of at least 0, got {self.time_window}")
+        # References per turn of each program, rounded to whole references. A turn of no references would never
+        # finish a program, so every turn is at least one reference long.
+        turns = [max(1, round(quantum * (weights[i] if weights else 1))) for i in range(self.num_programs)]
+        self._reset_counters()
+        if load_control:
+            self.working_set_estimators = [WorkingSetEstimator(self.time_window) for _ in range(self.num_programs)]
+
+        positions = [0] * self.num_programs
+        running = deque(i for i in range(self.num_programs) if self.programs[i][0])
+        suspended = deque()
+        try:
+            while running or suspended:
+                if not running:
+                    # Everything else has finished, so the next suspended program has the memory to itself
+                    self._resume(running, suspended)
+                i = running.popleft()
+                program_pages = self.programs[i][0]
+                end = min(len(program_pages), positions[i] + turns[i])
+                for position in range(positions[i], end):
+                    self.simulate_reference(i, program_pages[position])
+                positions[i] = end
+                if end < len(program_pages):
+                    running.append(i)
+                if load_control:
+                    self._control_load(running, suspended)
+        finally:
+            self.working_set_estimators = None
+
+        return self._report_totals()
+
+    def _report_totals(self):
+        for i, page_faults in enumerate(self.program_page_faults):
+            self.reporter.program_total(i, page_faults)
+        total_page_faults = sum(self.program_page_faults)
+        self.reporter.total(total_page_faults)
+        self._finish_simulation()
+        return total_page_faults
+
+    def _finish_simulation(self):
+        self.reporter.flush()
+        if self.metrics_path is not None:
+            self.write_metrics(self.metrics_path)
+
+    def _control_load(self, running, suspended):
+        estimators = self.working_set_estimators
+        demand = sum(estimators[i].size() for i in running)
+        while demand > len(self.page_frame.frames) and len(running) > 1:
+            i = max(running, key=lambda program: estimators[program].size())
+            running.remove(i)
+            suspended.append(i)
+            demand -= estimators[i].size()
+            self.evict_program(i)
+            self.load_control_events.append((self.total_references, "suspend", i))
+        # A suspended program's estimate stays at its size when it was suspended
+        while suspended and demand + estimators[suspended[0]].size() <= len(self.page_frame.frames):
+            demand += estimators[suspended[0]].size()
+            self._resume(running, suspended)
+
+    def _resume(self, running, suspended):
+        i = suspended.popleft()
+        running.append(i)
+        self.load_control_events.append((self.total_references, "resume", i))
+
+    '''
+    Replay a stream of (program_id, virtual_page) records, e.g. from paging_traces.read_trace. Records are consumed
+    one at a time so memory use does not depend on the length of the trace. Program ids start at 0 and programs
+    that have not been seen yet are added on the fly. Virtual pages are integers and each program has its own.
+    '''
+
+    def simulate_trace(self, records):
+        self._reset_counters()
+
+        for program_id, virtual_page in records:
+            while program_id >= self.num_programs:
+                self.add_program([])
+            self.simulate_reference(program_id, MemoryPage(virtual_page, virtual_page, 0))
+
+        return self._report_totals()
+
+    # Free all the frames of program `i` so other programs can use them. Returns the number of frames freed.
+    def evict_program(self, i) -> int:
+        return self.programs[i][1].release_pages()
+
+    # Number of frames holding pages of program `i`
+    def resident_set_size(self, i) -> int:
+        return len(self.programs[i][1].page_table.table)
+
+    # Number of resident pages of program `i` referenced within the last `time_window`. Scans the program's page
+    # table, so it is meant for sampling rather than for every reference.
+    def working_set_size(self, i) -> int:
+        frames = self.page_frame.frames
+        oldest_time = self.clock.now() - self.time_window
+        return sum(1 for physical_frame in self.programs[i][1].page_table.table.values()
+                   if frames[physical_frame].last_referenced_time >= oldest_time)
+
+    '''
+    Metrics of the last simulation: totals, the shared TLB and its lookup latency, the page table and its lookup
+    latency, evictions and eviction latency of each program, the sampled time per reference, and the samples in
+    fault_rate_history (working set size over time when `sample_interval` is set). Latencies are in nanoseconds.
+    '''
+
+    def metrics(self):
+        total_page_faults = sum(self.program_page_faults)
+        return {
+            "references": self.total_references,
+            "page_faults": total_page_faults,
+            "fault_rate": total_page_faults / self.total_references if self.total_references else 0.0,
+            "frames": len(self.page_frame.frames),
+            "time_window": self.time_window,
+            "tlb": self.tlb_cache.metrics(),
+            "reference_latency": dict(self.reference_latency.metrics(), calls=self.total_references),
+            "programs": [dict(row, **self.programs[row["program"] - 1][1].metrics())
+                         for row in self.program_report()],
+            "history": self.fault_rate_history,
+            "load_control_events": [{"time": event_time, "event": event, "program": i + 1}
+                                    for event_time, event, i in self.load_control_events],
+        }
+
+    def write_metrics(self, path):
+        with open(path, "w") as metrics_file:
+            json.dump(self.metrics(), metrics_file, indent=2)
+
+    '''
+    One row per program with its references, page faults and fault rate in the last simulation, and the number
+    of frames it holds now.
+    '''
+
+    def program_report(self):
+        report = []
+        for i in range(self.num_programs):
+            references = self.program_references[i]
+            page_faults = self.program_page_faults[i]
+            report.append({
+                "program": i + 1,
+                "references": references,
+                "page_faults": page_faults,
+                "fault_rate": page_faults / references if references else 0.0,
+                "resident_set_size": self.resident_set_size(i),
+            })
+        return report
+
+    def print_fault_rate_history(self):
+        print(f"{'time':>10} {'program':>8} {'references':>12} {'faults':>10} {'fault rate':>11} {'resident':>9} "
+              f"{'working set':>12}")
+        for row in self.fault_rate_history:
+            print(f"{row['time']:>10} {row['program']:>8} {row['references']:>12} {row['page_faults']:>10} "
+                  f"{row['fault_rate']:>11.2%} {row['resident_set_size']:>9} {row['working_set_size']:>12}")
+
+    def print_program_report(self):
+        print(f"{'program':>8} {'references':>12} {'faults':>10} {'fault rate':>11} {'resident':>9}")
+        for row in self.program_report():
+            print(f"{row['program']:>8} {row['references']:>12} {row['page_faults']:>10} "
+                  f"{row['fault_rate']:>11.2%} {row['resident_set_size']:>9}")
 
 
 def main():